@@ -47,7 +47,7 @@ def valid_dir(parser, arg):
 
 #  input: parser (argparser.parser)
 #         arg (str) full path of directory
-#         ext (str) extension (ex: .vcf). directory must have at least one of these files
+#         ext (str or tuple of str) extension (ex: .vcf). directory must have at least one of these files
 # output: arg (str) full path of directory with '/' as needed
 def valid_dir_ext(parser, arg, ext):
 	if not os.path.exists(arg):
@@ -137,6 +137,20 @@ def valid_float_above(parser, arg, lo):
 		parser.error(str(arg) + ' must be a float above ' + str(lo))
 	return arg
 
+def valid_float_in_range(parser, arg, lo, hi):
+	arg = valid_float_above(parser, arg, lo)
+	if arg > hi:
+		parser.error(str(arg) + ' must be a float between ' + str(lo) + ' and ' + str(hi))
+	return arg
+
+# comma separated list of values that are each one of choices
+def valid_choice_list(parser, arg, choices):
+	vals = arg.split(',')
+	for val in vals:
+		if val not in choices:
+			parser.error(val + ' must be one of ' + ', '.join(choices))
+	return vals
+
 
 # # # # # # # # # # # # # # # # # # # #
 #   H E L P E R   F U N C T I O N S   #
@@ -159,7 +173,7 @@ def _walklevel(some_dir, level = 0):
 		if num_sep + level <= num_sep_this:
 			del dirs[:]
 
-# returns all files in the directory with extension ext (ex. ext = '.vcf')
+# returns all files in the directory with extension ext (ex. ext = '.vcf', or a tuple of extensions)
 def _fnames_with_extension(directory, ext):
 	files = []
 	for file in os.listdir(directory):
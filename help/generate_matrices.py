@@ -11,24 +11,32 @@
 import sys      
 import os       
 import argparse 
-import vcf      
 import numpy as np
 import operator
 import random
 import pandas as pd 
+import multiprocessing as mp
 
 # custom imports
 import file_manager as fm
+import vcf_reader as vr
+
+#####################
+##### CONSTANTS #####
+#####################
+
+VCF_EXTENSIONS = ('.vcf', '.vcf.gz')  # plain, gzip or bgzip sample files. see vcf_reader
 
 #####################
 ##### FUNCTIONS #####
 #####################
 
 #  input: in_dir (str) full path to input directory containing .vcf file(s)
+#         num_processors (int) number of worker processes the samples are parsed on
 # output: bp_attr (dict) key is breakpoint index. val is tuple (chrm (str), pos (int), extends_left (bool))
 #         cv_attr (dict) key (int) is segment index. val is tuple (chrm (str), bgn_pos (int), end_pos (int))
-def get_mats(in_dir, scrna_file, n, const=120, sv_ub=80):
-    sampleList = fm._fnames_with_extension(in_dir, '.vcf')
+def get_mats(in_dir, scrna_file, n, const=120, sv_ub=80, num_processors=1):
+    sampleList = fm._fnames_with_extension(in_dir, VCF_EXTENSIONS)
 
     m = len(sampleList)
     sampleList.sort()
@@ -37,18 +45,28 @@ def get_mats(in_dir, scrna_file, n, const=120, sv_ub=80):
 
     BP_sample_dict, CN_sample_dict, CN_sample_rec_dict, CN_sample_rec_dict_minor, CN_sample_rec_dict_major = dict(), dict(), dict(), dict(), dict()
     SNV_sample_dict = {}
+    rna_genes, C_RNA = read_scrna(scrna_file)
+    gene_index = index_genes(rna_genes)
+    jobs = [ (in_dir + '/' + sample, gene_index) for sample in sampleList ]
+    num_workers = max(1, min(num_processors, m))
+    if num_workers > 1 and not mp.current_process().daemon:  # samples are independent until their indices are merged
+        pool = mp.Pool(num_workers)
+        try:
+            sample_dicts = pool.map(_read_sample_dict, jobs)
+        finally:
+            pool.terminate()
+    else:
+        sample_dicts = [ _read_sample_dict(job) for job in jobs ]
     for i, sample in enumerate(sampleList):
-        input_vcf_file = in_dir + '/' + sample
-        reader = vcf.Reader(open(input_vcf_file, 'r'))
-        scrna_df = pd.read_csv(scrna_file,sep='\t')
-        
-        BP_sample_dict[sample], CN_sample_dict[sample], CN_sample_rec_dict[sample], CN_sample_rec_dict_minor[sample], CN_sample_rec_dict_major[sample], mateIDs, toTuple, SNV_sample_dict[sample], C_RNA = get_sample_dict(reader, scrna_df)
+        BP_sample_dict[sample], CN_sample_dict[sample], CN_sample_rec_dict[sample], CN_sample_rec_dict_minor[sample], CN_sample_rec_dict_major[sample], mateIDs, toTuple, SNV_sample_dict[sample] = sample_dicts[i]
         # prepend sample index to each breakpoint ID
         #print(sample, (BP_sample_dict[sample].items()))
         for k, v in mateIDs.iteritems():
             bp_id_to_mate_id[str(i+1) + k] = str(i+1) + v # add all entries from mateIDs (dict) to bp_id_to_mate_id (dict)
             bp_id_to_tuple[str(i+1) + k] = toTuple[k]     # add all entries from toTuple (dict) to bp_id_to_tuple (dict)
 
+    C_RNA = aggregate_scrna(gene_index, C_RNA, CN_sample_rec_dict[sampleList[-1]])  # the segments of the last sample are used
+
     BP_idx_dict, l = get_BP_idx_dict(BP_sample_dict)
     G = make_G(BP_idx_dict, bp_id_to_mate_id, bp_id_to_tuple)
     CN_startPos_dict, CN_endPos_dict, r = get_CN_indices_dict(CN_sample_dict)
@@ -374,26 +392,29 @@ def make_matrices(m, n, l, g, r, G, sampleList, BP_sample_dict, BP_idx_dict,  SN
         else:
             raise Exception("Error during making matrices")
 
+    sampled_sv_new_idx, unsampled_sv_new_idx = _new_idx_dict(sampled_sv_idx_list_sorted), _new_idx_dict(unsampled_sv_idx_list_sorted)
+    sampled_snv_new_idx, unsampled_snv_new_idx = _new_idx_dict(sampled_snv_idx_list_sorted), _new_idx_dict(unsampled_snv_idx_list_sorted)
+
     for (chrom, pos, dir), bp_idx in BP_idx_dict.items():
-        if bp_idx in sampled_sv_idx_list_sorted:
-            new_idx = np.where(sampled_sv_idx_list_sorted == bp_idx)[0][0]
+        if bp_idx in sampled_sv_new_idx:
+            new_idx = sampled_sv_new_idx[bp_idx]
             F_SV_info[new_idx][0] = chrom
             F_SV_info[new_idx][1] = pos
             F_SV_info[new_idx][2] = "sv_" + str(bp_idx)
         else:
-            new_idx = np.where(unsampled_sv_idx_list_sorted == bp_idx)[0][0]
+            new_idx = unsampled_sv_new_idx[bp_idx]
             F_SV_unsampled_info[new_idx][0] = chrom
             F_SV_unsampled_info[new_idx][1] = pos
             F_SV_unsampled_info[new_idx][2] = "sv_" + str(bp_idx)
 
     for (chrom, pos), snv_idx in SNV_idx_dict.items():
-        if snv_idx in sampled_snv_idx_list_sorted:
-            new_idx = np.where(sampled_snv_idx_list_sorted == snv_idx)[0][0]
+        if snv_idx in sampled_snv_new_idx:
+            new_idx = sampled_snv_new_idx[snv_idx]
             F_SNV_info[new_idx][0] = chrom
             F_SNV_info[new_idx][1] = pos
             F_SNV_info[new_idx][2] = "snv_" + str(snv_idx)
         else:
-            new_idx = np.where(unsampled_snv_idx_list_sorted == snv_idx)[0][0]
+            new_idx = unsampled_snv_new_idx[snv_idx]
             F_SNV_unsampled_info[new_idx][0] = chrom
             F_SNV_unsampled_info[new_idx][1] = pos
             F_SNV_unsampled_info[new_idx][2] = "snv_" + str(snv_idx)
@@ -412,6 +433,9 @@ def make_matrices(m, n, l, g, r, G, sampleList, BP_sample_dict, BP_idx_dict,  SN
     #     F_info_phasing[l + g + cn_idx+r][2] = endpos
     # make list of segment boundaries. used to set Q to 1 even if bp not on edge of segment
     seg_dic = _get_seg_bgn_end_pos(CN_startPos_dict, CN_endPos_dict)
+    seg_index = _get_seg_index(seg_dic)
+    seg_lookups = {} # key is id of a part of Q. val (tuple) (Q part, list of (row, chrom, pos, message if not found)) of
+                     #   the mutations not on the edge of a segment
 
     for sample_idx in range(len(sampleList)):
         sample = sampleList[sample_idx]
@@ -422,85 +446,54 @@ def make_matrices(m, n, l, g, r, G, sampleList, BP_sample_dict, BP_idx_dict,  SN
                     # cn, direction, bdp, dp = temp_bp_info_dict['cn'], temp_bp_info_dict['dir'], temp_bp_info_dict['bdp'], temp_bp_info_dict['dp']
                     cn, direction, = temp_bp_info_dict['cn'], temp_bp_info_dict['dir']
                     bp_idx = BP_idx_dict[(chrom, pos, direction)]
-                    if bp_idx in sampled_sv_idx_list_sorted:
-                        new_idx = np.where(sampled_sv_idx_list_sorted == bp_idx)[0][0]
+                    if bp_idx in sampled_sv_new_idx:
+                        new_idx = sampled_sv_new_idx[bp_idx]
                         #F[sample_idx][bp_idx] = cn
                         F_SV[sample_idx][new_idx] = cn
+                        Q_part = Q_SV
 
                         # A[sample_idx][bp_idx] = bdp
                         # H[sample_idx][bp_idx] = dp
-
-                        if direction == False and (chrom, pos) in CN_endPos_dict:
-                            cn_idx = CN_endPos_dict[(chrom, pos)]
-                            Q_SV[new_idx][cn_idx] = 1
-                        elif direction == True and (chrom, pos) in CN_startPos_dict:
-                            cn_idx = CN_startPos_dict[(chrom, pos)]
-                            Q_SV[new_idx][cn_idx] = 1
-                        else: # search through all posible segments where bp could lie
-                            if chrom in seg_dic.keys():
-                                cn_idx = _get_seg_idx(seg_dic[chrom], pos)
-                                if cn_idx != None:
-                                    Q_SV[new_idx][cn_idx] = 1
-                                else:
-                                    print("breakpoint id " + str(bp_id) + " at chr " + str(chrom) + " pos " + str(pos) + " is not found in copy number info.")
-                            else:
-                                print("breakpoint id " + str(bp_id) + " at chr " + str(chrom) + " pos " + str(
-                                    pos) + " is not found in copy number info.")
                     else:
-                        new_idx = np.where(unsampled_sv_idx_list_sorted == bp_idx)[0][0]
+                        new_idx = unsampled_sv_new_idx[bp_idx]
                     #F[sample_idx][bp_idx] = cn
                         F_SV_unsampled[sample_idx][new_idx] = cn
+                        Q_part = Q_SV_unsampled
 
                         # A[sample_idx][bp_idx] = bdp
                         # H[sample_idx][bp_idx] = dp
 
-                        if direction == False and (chrom, pos) in CN_endPos_dict:
-                            cn_idx = CN_endPos_dict[(chrom, pos)]
-                            Q_SV_unsampled[new_idx][cn_idx] = 1
-                        elif direction == True and (chrom, pos) in CN_startPos_dict:
-                            cn_idx = CN_startPos_dict[(chrom, pos)]
-                            Q_SV_unsampled[new_idx][cn_idx] = 1
-                        else: # search through all posible segments where bp could lie
-                            if chrom in seg_dic.keys():
-                                cn_idx = _get_seg_idx(seg_dic[chrom], pos)
-                                if cn_idx != None:
-                                    Q_SV_unsampled[new_idx][cn_idx] = 1
-                                else:
-                                    print("breakpoint id " + str(bp_id) + " at chr " + str(chrom) + " pos " + str(pos) + " is not found in copy number info.")
-                            else:
-                                print("breakpoint id " + str(bp_id) + " at chr " + str(chrom) + " pos " + str(
-                                    pos) + " is not found in copy number info.")
+                    if direction == False and (chrom, pos) in CN_endPos_dict:
+                        cn_idx = CN_endPos_dict[(chrom, pos)]
+                        Q_part[new_idx][cn_idx] = 1
+                    elif direction == True and (chrom, pos) in CN_startPos_dict:
+                        cn_idx = CN_startPos_dict[(chrom, pos)]
+                        Q_part[new_idx][cn_idx] = 1
+                    else: # search through all posible segments where bp could lie
+                        if chrom in seg_index:
+                            seg_lookups.setdefault(id(Q_part), (Q_part, []))[1].append((new_idx, chrom, pos, "breakpoint id " + str(bp_id) + " at chr " + str(chrom) + " pos " + str(pos) + " is not found in copy number info."))
+                        else:
+                            print("breakpoint id " + str(bp_id) + " at chr " + str(chrom) + " pos " + str(
+                                pos) + " is not found in copy number info.")
 
 
         for chrom, pos in SNV_sample_dict[sample].keys():
             snv_idx = SNV_idx_dict[(chrom, pos)]
             cn = SNV_sample_dict[sample][(chrom, pos)]
-            if snv_idx in sampled_snv_idx_list_sorted:
-                new_idx = np.where(sampled_snv_idx_list_sorted == snv_idx)[0][0]
+            if snv_idx in sampled_snv_new_idx:
+                new_idx = sampled_snv_new_idx[snv_idx]
                 F_SNV[sample_idx][new_idx] = cn
-                if chrom in seg_dic.keys():
-                    cn_idx = _get_seg_idx(seg_dic[chrom], pos)
-                    if cn_idx != None:
-                        Q_SNV[new_idx][cn_idx] = 1
-                    else:
-                        print("snv at chr " + str(chrom) + " pos " + str(
-                            pos) + " is not found in copy number info.")
-                else:
-                    print("snv id at chr " + str(chrom) + " pos " + str(
-                        pos) + " is not found in copy number info.")
+                Q_part = Q_SNV
             else:
-                new_idx = np.where(unsampled_snv_idx_list_sorted == snv_idx)[0][0]
+                new_idx = unsampled_snv_new_idx[snv_idx]
                 F_SNV_unsampled[sample_idx][new_idx] = cn
-                if chrom in seg_dic.keys():
-                    cn_idx = _get_seg_idx(seg_dic[chrom], pos)
-                    if cn_idx != None:
-                        Q_SNV_unsampled[new_idx][cn_idx] = 1
-                    else:
-                        print("snv at chr " + str(chrom) + " pos " + str(
-                            pos) + " is not found in copy number info.")
-                else:
-                    print("snv id at chr " + str(chrom) + " pos " + str(
-                        pos) + " is not found in copy number info.")
+                Q_part = Q_SNV_unsampled
+            if chrom in seg_index:
+                seg_lookups.setdefault(id(Q_part), (Q_part, []))[1].append((new_idx, chrom, pos, "snv at chr " + str(chrom) + " pos " + str(
+                    pos) + " is not found in copy number info."))
+            else:
+                print("snv id at chr " + str(chrom) + " pos " + str(
+                    pos) + " is not found in copy number info.")
         for chrom in CN_sample_rec_dict[sample]:
             for (s,e) in CN_sample_rec_dict[sample][chrom]:
                 cn_idx_list = get_CN_indices(CN_startPos_dict, CN_endPos_dict, chrom, s, e)
@@ -511,19 +504,56 @@ def make_matrices(m, n, l, g, r, G, sampleList, BP_sample_dict, BP_idx_dict,  SN
                     F_CNV[sample_idx][cn_idx] = cn_minor
                     F_CNV[sample_idx][cn_idx+r] = cn_major
 
+    # segments of the looked up mutations in bulk, then one scatter into each part of Q
+    for Q_part, lookups in seg_lookups.values():
+        rows, chrms, poss, msgs = zip(*lookups)
+        cn_idxs = _get_seg_idxs(seg_index, chrms, np.array(poss, dtype = int))
+        for msg in np.array(msgs)[cn_idxs < 0]:
+            print(msg)
+        found = cn_idxs >= 0
+        Q_part[np.array(rows, dtype = int)[found], cn_idxs[found]] = 1
+
     # create dictionary with key as segment index and val as tuple containing (chrm, bgn, end)
     cv_attr = { i: (chrm, bgn, end) for chrm, lst in seg_dic.iteritems() for (i, bgn, end) in lst }
     return F_phasing, F_unsampled_phasing, G_sampled, G_unsampled, Q, Q_unsampled, A, H, cv_attr, F_info_phasing, F_unsampled_info_phasing, sampled_snv_idx_list_sorted, unsampled_snv_idx_list_sorted, sampled_sv_idx_list_sorted, unsampled_sv_idx_list_sorted
     ### A and H are empty lists
 
-#  input: segs (list of tuple) tuple is ( seg_idx, bgn_pos, end_pos ) for segments of a single chromosome
-#         pos (int) position of segment that will be returned
-# output: i (int) index of segment where pos lies
-def _get_seg_idx(segs, pos):
-    for idx, bgn, end in segs:
-        if bgn <= pos and pos <= end:
-            return idx
-    return None
+#  input: seg_dic (dict) see _get_seg_bgn_end_pos
+# output: seg_index (dict) key is chrm. val (tuple) (bgns, ends, idxs) (np.array of int) of its segments sorted by bgn_pos.
+#           empty segments (bgn_pos > end_pos) are left out since no position lies in them
+def _get_seg_index(seg_dic):
+    seg_index = {}
+    for chrm, segs in seg_dic.iteritems():
+        idxs, bgns, ends = [ np.array(x, dtype = int) for x in zip(*segs) ]
+        order = np.argsort(bgns, kind = 'mergesort')
+        order = order[bgns[order] <= ends[order]]
+        seg_index[chrm] = (bgns[order], ends[order], idxs[order])
+    return seg_index
+
+
+#  input: seg_index (dict) see _get_seg_index
+#         chrms (list of str) chromosome of each position
+#         poss (np.array of int) positions to look up
+# output: seg_idxs (np.array of int) index of the segment where each position lies. -1 if it lies in none
+#  notes: the segments of a chromosome do not overlap (see get_CN_indices_dict), so the last one starting at or before a
+#         position is the only one that can hold it
+def _get_seg_idxs(seg_index, chrms, poss):
+    seg_idxs = np.full(len(poss), -1, dtype = int)
+    chrms = np.array(chrms)
+    for chrm in set(chrms.tolist()):
+        if chrm not in seg_index:
+            continue
+        bgns, ends, idxs = seg_index[chrm]
+        recs = np.where(chrms == chrm)[0]
+        k = np.searchsorted(bgns, poss[recs], side = 'right') - 1
+        found = (k >= 0) & (ends[np.maximum(k, 0)] >= poss[recs])
+        seg_idxs[recs[found]] = idxs[k[found]]
+    return seg_idxs
+
+
+# output: new_idx (dict) key (int) is an index in idx_list. val (int) is its position in idx_list
+def _new_idx_dict(idx_list):
+    return dict([ (int(idx), new_idx) for new_idx, idx in enumerate(idx_list) ])
 
 
 # output: seg_dic (dict) key is chrm (int). val is segs (list of tuple)
@@ -618,6 +648,90 @@ def _inv_dic(dic):
     return inv_dic
 
 
+#  input: job (tuple) (input_vcf_file (str) .vcf file of one sample, gene_index (dict) see index_genes)
+# output: see get_sample_dict. run in the worker processes of get_mats, so everything returned is plain dicts and arrays
+def _read_sample_dict(job):
+    input_vcf_file, gene_index = job
+    recs = vr.read_sample(input_vcf_file)
+    return get_sample_dict(recs, gene_index)
+
+
+#  input: scrna_file (str) .tsv of the scRNA copy numbers. a row is a clone. the first half of the columns are genes
+#           named chrm_bgn_end_p and the second half the same genes named chrm_bgn_end_m
+# output: rna_genes (pd.DataFrame) [num genes, 3] int columns CHROM, st, end of each gene, parsed from the _p names
+#         C_RNA (np.array of float) [num clones, 2 * num genes] copy numbers of the _p then the _m genes
+def read_scrna(scrna_file):
+    scrna_df = pd.read_csv(scrna_file,sep='\t')
+    rna_cols = pd.Series(scrna_df.columns[:len(scrna_df.columns)//2])
+    rna_genes = rna_cols.str.split('_', expand=True).iloc[:, 0:3].astype(int)
+    rna_genes.columns = ['CHROM', 'st', 'end']
+    return rna_genes, scrna_df.to_numpy()
+
+
+#  input: rna_genes (pd.DataFrame) see read_scrna
+# output: gene_index (dict) key (int) is chromosome. val (tuple) (idx, bgns, ends, max_ends) (np.array of int) of the genes
+#           on the chromosome sorted by start: their columns in C_RNA, starts, ends and the largest end of the genes so far
+def index_genes(rna_genes):
+    chrms, bgns, ends = [ rna_genes[key].to_numpy() for key in ['CHROM', 'st', 'end'] ]
+    gene_index = {}
+    for chrm in np.unique(chrms):
+        idx = np.where(chrms == chrm)[0]
+        idx = idx[np.argsort(bgns[idx], kind = 'mergesort')]
+        gene_index[int(chrm)] = (idx, bgns[idx], ends[idx], np.maximum.accumulate(ends[idx]))
+    return gene_index
+
+
+#  input: gene_index (dict) see index_genes
+#         chrms (list of str), bgns, ends (np.array of int) ranges of copy number records
+# output: in_gene (np.array of bool) True if the range lies inside some gene
+def in_genes(gene_index, chrms, bgns, ends):
+    in_gene = np.zeros(len(chrms), dtype = bool)
+    chrms = np.array([ int(chrm) for chrm in chrms ], dtype = int)
+    for chrm, (_, g_bgns, _, max_ends) in gene_index.items():
+        recs = np.where(chrms == chrm)[0]
+        k = np.searchsorted(g_bgns, bgns[recs], side = 'right') # number of genes starting at or before each range
+        in_gene[recs] = (k > 0) & (max_ends[np.maximum(k - 1, 0)] >= ends[recs])
+    return in_gene
+
+
+#  input: gene_index (dict) see index_genes. C_RNA see read_scrna
+#         CN_sample_rec (dict) CN_sample_rec_dict of one sample. see get_sample_dict
+# output: C_RNA (np.array of float) [num clones, 2 * num columns] the genes inside a copy number segment are averaged into
+#           one column, rounded to 2 decimals, that takes the place of the first of them. genes outside every segment
+#           are kept as they are
+#  notes: a gene inside more than one segment goes to the first of them
+def aggregate_scrna(gene_index, C_RNA, CN_sample_rec):
+    num_genes = C_RNA.shape[1] // 2
+    seg_idx = np.full(num_genes, -1) # segment of each gene. -1 if it is outside every segment
+    num_segs = 0
+    for chrom, segments in CN_sample_rec.items():
+        if int(chrom) not in gene_index:
+            continue
+        idx, g_bgns, g_ends, _ = gene_index[int(chrom)]
+        for (bgn, end) in segments:
+            i, j = np.searchsorted(g_bgns, bgn, side = 'left'), np.searchsorted(g_bgns, end, side = 'right')
+            inside = idx[i:j][g_ends[i:j] <= end] # genes starting in the segment that also end in it
+            inside = inside[seg_idx[inside] < 0]
+            seg_idx[inside] = num_segs
+            num_segs += 1
+
+    # genes of each segment next to each other, in gene order. the first of them keeps the average
+    in_seg = np.where(seg_idx >= 0)[0]
+    order = in_seg[np.argsort(seg_idx[in_seg], kind = 'mergesort')]
+    _, bounds, counts = np.unique(seg_idx[order], return_index = True, return_counts = True)
+    first = order[bounds]
+    keep = seg_idx < 0
+    keep[first] = True
+    halves = []
+    for C_half in [ C_RNA[:, :num_genes], C_RNA[:, num_genes:] ]:
+        C_half = C_half.copy()
+        C_seg = C_half[:, order]
+        for j, (b, k) in enumerate(zip(bounds, counts)): # same float sums as np.mean of the segment's genes
+            C_half[:, first[j]] = np.round(C_seg[:, b:b + k].mean(axis = 1), decimals = 2)
+        halves.append(C_half[:, keep])
+    return np.hstack(halves)
+
+
 # return three dictionaries: BP_sample_dict, CN_sample_dict, and CN_sample_rec_dict
 # 1. BP_sample_dict: 
 #    key: sample
@@ -631,7 +745,9 @@ def _inv_dic(dic):
 #    value: {chr1: {(s1, e1): cn1, (s2, e2): cn2, ...}, chr2: {...}...}
 # 4. bp_id_to_mate_id (dict) key (str) is ID of breakpoint. val (str) is ID of mate
 # 5. bp_id_to_tuple   (dict) key (str) is ID of breakpoint. val (tuple) is (chrm_num, pos, direction)
-def get_sample_dict(reader, scrna_df):
+#  input: recs (dict) records of one sample from vr.read_sample
+#         gene_index (dict) see index_genes. copy number segments outside every scRNA gene are left out
+def get_sample_dict(recs, gene_index):
     BP_sample_dict, CN_sample_dict, CN_sample_rec_dict_minor, CN_sample_rec_dict_major, CN_sample_rec_dict = dict(), dict(), dict(), dict(), dict()
     SNV_sample_dict = {}
     bp_id_to_mate_id = {} # key is id (str). val is mate id (str)
@@ -641,77 +757,55 @@ def get_sample_dict(reader, scrna_df):
     # bp_idx = 0
     # cnv_idx = 0
     # snv_idx = 0
-    # nishat added for scrna nov 29, 2024
-    C_RNA = scrna_df.to_numpy()
-    rna_cols = scrna_df.columns
-    rna_cols = rna_cols[:len(rna_cols)//2]
-    
-    rna_col_df = pd.DataFrame(columns=['CHROM', 'st', 'end']) ### nb
-    for i in rna_cols: ### nb
-        rna_col_df = pd.concat([rna_col_df, pd.DataFrame({'CHROM': [int(i.split('_')[0])], 'st': [int(i.split('_')[1])], 'end': [int(i.split('_')[2])]})], ignore_index=True,sort = False) ### nb
-    
     #----
     count = 0
     bp_id_set = set()
-    for rec in reader:
-        if is_sv_record(rec):
-            count += 1
-            #print(rec)
-            if rec.CHROM not in BP_sample_dict:
-                BP_sample_dict[rec.CHROM] = dict()
-            if rec.POS not in BP_sample_dict[rec.CHROM]:
-                BP_sample_dict[rec.CHROM][rec.POS] = dict()
-            bp_id = rec.ID
-            if bp_id not in bp_id_set:
-                bp_id_set.add(bp_id)
-            else:
-                print(bp_id, 'already in set')
-            #print bp_id
-            if bp_id not in BP_sample_dict[rec.CHROM][rec.POS]: # had to add unique identifier since seg len of 1 exists
-                BP_sample_dict[rec.CHROM][rec.POS][bp_id] = {}
-            else:
-                print(bp_id, 'already in set')
-            BP_sample_dict[rec.CHROM][rec.POS][bp_id]['id'] = rec.ID
-            BP_sample_dict[rec.CHROM][rec.POS][bp_id]['cn'] = rec.samples[0].data.CNADJ
-            BP_sample_dict[rec.CHROM][rec.POS][bp_id]['mate_dir'] = rec.ALT[0].remoteOrientation
-            # BP_sample_dict[rec.CHROM][rec.POS][bp_id]['mate_id'] = rec.INFO['MATEID']
-            BP_sample_dict[rec.CHROM][rec.POS][bp_id]['mate_pos'] = rec.ALT[0].pos
-            BP_sample_dict[rec.CHROM][rec.POS][bp_id]['mate_chr'] = rec.ALT[0].chr
-
-            bp_id_to_mate_id[rec.ID] = rec.INFO['MATEID'][0]
-            bp_id_to_mate_dir[rec.ID] = rec.ALT[0].remoteOrientation
-
-            # BP_sample_dict[rec.CHROM][rec.POS]['bdp'] = rec.samples[0].data.BDP
-            # BP_sample_dict[rec.CHROM][rec.POS]['dp'] = rec.samples[0].data.DP
-
-        elif is_snv_record(rec):
-            if (rec.CHROM, rec.POS) not in SNV_sample_dict:
-                SNV_sample_dict[(rec.CHROM,rec.POS)] = rec.samples[0].data.CNADJ
-
-        elif is_cnv_record(rec):
-            if int(rec.CHROM) not in rna_col_df['CHROM']: ### nb
-                continue ### nb
-            else:  ### nb
-                chr_subdf = rna_col_df[rna_col_df['CHROM']==int(rec.CHROM)] ### nb
-                if isinstance(rec.INFO['END'], list): 
-                    info_end = rec.INFO['END'][0]
-                else:
-                    info_end = rec.INFO['END']
-                range_matches = chr_subdf.apply(lambda row: int(rec.POS) >= row['st'] and int(info_end) <= row['end'], axis=1) ### nb
-                
-                if not range_matches.empty and range_matches.any(): ### nb
-                    
-                    if rec.CHROM not in CN_sample_dict:
-                        CN_sample_dict[rec.CHROM] = dict()
-                        CN_sample_rec_dict[rec.CHROM] = dict() ### xf
-                        CN_sample_rec_dict_minor[rec.CHROM] = dict() ### xf
-                        CN_sample_rec_dict_major[rec.CHROM] = dict() ### xf
-                    
-                    CN_sample_dict[rec.CHROM][rec.POS] = ['s']
-                    CN_sample_dict[rec.CHROM][info_end] = ['e']
-                    CN_sample_rec_dict[rec.CHROM][(rec.POS, info_end)] = sum(rec.samples[0].data.CN)
-                    CN_sample_rec_dict_minor[rec.CHROM][(rec.POS, info_end)] = rec.samples[0].data.CN[0]
-                    CN_sample_rec_dict_major[rec.CHROM][(rec.POS, info_end)] = rec.samples[0].data.CN[1]
+    sv = recs['sv']
+    for bp_id, chrom, pos, cn, mate_id, mate_chr, mate_pos, mate_dir in zip(sv['id'], sv['chrom'], sv['pos'].tolist(), sv['cnadj'].tolist(), sv['mate_id'],
+                                                                            sv['mate_chr'], sv['mate_pos'].tolist(), sv['remote_orientation'].tolist()):
+        count += 1
+        if chrom not in BP_sample_dict:
+            BP_sample_dict[chrom] = dict()
+        if pos not in BP_sample_dict[chrom]:
+            BP_sample_dict[chrom][pos] = dict()
+        if bp_id not in bp_id_set:
+            bp_id_set.add(bp_id)
+        else:
+            print(bp_id, 'already in set')
+        if bp_id not in BP_sample_dict[chrom][pos]: # had to add unique identifier since seg len of 1 exists
+            BP_sample_dict[chrom][pos][bp_id] = {}
+        else:
+            print(bp_id, 'already in set')
+        BP_sample_dict[chrom][pos][bp_id]['id'] = bp_id
+        BP_sample_dict[chrom][pos][bp_id]['cn'] = cn
+        BP_sample_dict[chrom][pos][bp_id]['mate_dir'] = mate_dir
+        BP_sample_dict[chrom][pos][bp_id]['mate_pos'] = mate_pos
+        BP_sample_dict[chrom][pos][bp_id]['mate_chr'] = mate_chr
+
+        bp_id_to_mate_id[bp_id] = mate_id
+        bp_id_to_mate_dir[bp_id] = mate_dir
+
+    snv = recs['snv']
+    for chrom, pos, cn in zip(snv['chrom'], snv['pos'].tolist(), snv['cnadj'].tolist()):
+        if (chrom, pos) not in SNV_sample_dict:
+            SNV_sample_dict[(chrom, pos)] = cn
+
+    cnv = recs['cnv']
+    in_gene = in_genes(gene_index, cnv['chrom'], cnv['pos'], cnv['end']) ### nb
+    for chrom, pos, info_end, (cn_minor, cn_major), keep in zip(cnv['chrom'], cnv['pos'].tolist(), cnv['end'].tolist(), cnv['cn'].tolist(), in_gene.tolist()):
+        if not keep: ### nb
+            continue ### nb
+        if chrom not in CN_sample_dict:
+            CN_sample_dict[chrom] = dict()
+            CN_sample_rec_dict[chrom] = dict() ### xf
+            CN_sample_rec_dict_minor[chrom] = dict() ### xf
+            CN_sample_rec_dict_major[chrom] = dict() ### xf
+        
+        CN_sample_dict[chrom][pos] = ['s']
+        CN_sample_dict[chrom][info_end] = ['e']
+        CN_sample_rec_dict[chrom][(pos, info_end)] = cn_minor + cn_major
+        CN_sample_rec_dict_minor[chrom][(pos, info_end)] = cn_minor
+        CN_sample_rec_dict_major[chrom][(pos, info_end)] = cn_major
     count2 = 0
     for chrom in BP_sample_dict:
         for pos in BP_sample_dict[chrom]:
@@ -726,37 +820,7 @@ def get_sample_dict(reader, scrna_df):
 
                 bp_id_to_tuple[bp_id] = (chrom, pos, my_dir)
     
-    #### nb:: adding average of genes according to DNA segments.
-    for chrom, segments in CN_sample_rec_dict.items():
-        for cn_range, _ in segments.items():
-            matching_indices = rna_col_df[
-                (rna_col_df['CHROM'] == int(chrom)) &
-                (rna_col_df['st'] >= cn_range[0]) &
-                (rna_col_df['end'] <= cn_range[1])
-            ].index
-            
-            if not matching_indices.empty:
-                if len(matching_indices > 1):
-                    no_genes = rna_col_df.shape[0]
-                    matching_indices_minor = matching_indices + no_genes
-                    avg = np.round(C_RNA[:, matching_indices].mean(axis=1), decimals=2)
-                    avg_minor = np.round(C_RNA[:, matching_indices_minor].mean(axis=1), decimals=2)
-                    first_index_major = matching_indices[0]
-                    first_index_minor = matching_indices_minor[0]
-                    C_RNA[:, first_index_major] = avg
-                    C_RNA[:, first_index_minor] = avg_minor
-                    
-                    rna_col_df.loc[first_index_major, 'st'] = cn_range[0]
-                    rna_col_df.loc[first_index_major, 'end'] = cn_range[1]
-
-                    indices_to_drop_major = matching_indices[1:]
-                    indices_to_drop_minor = matching_indices_minor[1:]
-
-                    indices_to_drop = np.append(indices_to_drop_major, indices_to_drop_minor)
-                    rna_col_df = rna_col_df.drop(indices_to_drop_major).reset_index(drop=True)
-                    C_RNA = np.delete(C_RNA, indices_to_drop, axis=1)
-    
-    return BP_sample_dict, CN_sample_dict, CN_sample_rec_dict, CN_sample_rec_dict_minor, CN_sample_rec_dict_major, bp_id_to_mate_id, bp_id_to_tuple, SNV_sample_dict, C_RNA
+    return BP_sample_dict, CN_sample_dict, CN_sample_rec_dict, CN_sample_rec_dict_minor, CN_sample_rec_dict_major, bp_id_to_mate_id, bp_id_to_tuple, SNV_sample_dict
 
 
 # CN_startPos_dict: key: (chrom, startPos), val: idx
@@ -0,0 +1,132 @@
+#     file: vcf_reader.py
+#  purpose: Streaming reader of the input .vcf files. generate_matrices.get_sample_dict only needs the ID, CHROM,
+#           POS, INFO END and MATEID, the breakend of ALT and the CN and CNADJ fields of the first sample, so only
+#           those are parsed, one line at a time, into compact arrays per record type. reads plain, gzip and bgzip
+#           (multi member gzip) files. values are the ones PyVCF's vcf.Reader gives, except that single valued
+#           CNADJ is a number instead of a list of one number
+
+
+# # # # # # # # # # #
+#   I M P O R T S   #
+# # # # # # # # # # #
+
+import io
+import sys
+import gzip
+import numpy as np
+
+
+# # # # # # # # # # # # #
+#   C O N S T A N T S   #
+# # # # # # # # # # # # #
+
+GZIP_MAGIC = b'\x1f\x8b'
+SV_PREFIX, SNV_PREFIX, CNV_PREFIX = 'sv', 'snv', 'cnv'  # ID prefixes of the record types. see generate_matrices.is_sv_record
+MISSING = '.'
+
+
+# # # # # # # # # # # # #
+#   F U N C T I O N S   #
+# # # # # # # # # # # # #
+
+#  input: fname (str) .vcf or .vcf.gz file of one sample
+# output: recs (dict) key is 'sv', 'snv' or 'cnv'. val (dict) arrays of the records of that type in file order
+#           sv:  id, chrom, mate_id, mate_chr (list of str), pos, mate_pos (np.array of int), cnadj (np.array of float),
+#                remote_orientation (np.array of bool) True if the mate breakend is written [p[ or t[p[ in ALT
+#           snv: chrom (list of str), pos (np.array of int), cnadj (np.array of float)
+#           cnv: chrom (list of str), pos, end (np.array of int), cn (np.array of float) [num cnv, 2] CN of both alleles
+#  notes: missing numbers are nan. records of any other type are skipped
+def read_sample(fname):
+    sv = { 'id': [], 'chrom': [], 'pos': [], 'cnadj': [], 'mate_id': [], 'mate_chr': [], 'mate_pos': [], 'remote_orientation': [] }
+    snv = { 'chrom': [], 'pos': [], 'cnadj': [] }
+    cnv = { 'chrom': [], 'pos': [], 'end': [], 'cn': [] }
+    fmt_cols = {}  # key is FORMAT string. val is dict of column of each key
+    f = _open(fname)
+    try:
+        for line in f:
+            if line[0] == '#':
+                continue
+            cols = line.rstrip('\r\n').split('\t', 10)
+            rec_id = cols[2]
+            if rec_id.startswith(SV_PREFIX):
+                fields = cols[9].split(':')
+                col = _format_cols(fmt_cols, cols[8])
+                mate_chr, mate_pos, remote = _parse_breakend(cols[4].split(',')[0])
+                sv['id'].append(rec_id)
+                sv['chrom'].append(cols[0])
+                sv['pos'].append(cols[1])
+                sv['cnadj'].append(_first_number(fields, col.get('CNADJ')))
+                sv['mate_id'].append(_parse_info(cols[7]).get('MATEID', '').split(',')[0])
+                sv['mate_chr'].append(mate_chr)
+                sv['mate_pos'].append(mate_pos)
+                sv['remote_orientation'].append(remote)
+            elif rec_id.startswith(SNV_PREFIX):
+                col = _format_cols(fmt_cols, cols[8])
+                snv['chrom'].append(cols[0])
+                snv['pos'].append(cols[1])
+                snv['cnadj'].append(_first_number(cols[9].split(':'), col.get('CNADJ')))
+            elif rec_id.startswith(CNV_PREFIX):
+                fields = cols[9].split(':')
+                col = _format_cols(fmt_cols, cols[8])
+                cn = fields[col['CN']].split(',') if col.get('CN', len(fields)) < len(fields) else []
+                cnv['chrom'].append(cols[0])
+                cnv['pos'].append(cols[1])
+                cnv['end'].append(_parse_info(cols[7])['END'].split(',')[0])
+                cnv['cn'].append([ _to_float(x) for x in (cn + [ MISSING, MISSING ])[:2] ])
+    finally:
+        f.close()
+    for recs, int_keys, float_keys in [ (sv, [ 'pos', 'mate_pos' ], [ 'cnadj' ]), (snv, [ 'pos' ], [ 'cnadj' ]), (cnv, [ 'pos', 'end' ], [ 'cn' ]) ]:
+        for key in int_keys:
+            recs[key] = np.array(recs[key], dtype = np.int64)
+        for key in float_keys:
+            recs[key] = np.array(recs[key], dtype = float)
+    sv['remote_orientation'] = np.array(sv['remote_orientation'], dtype = bool)
+    cnv['cn'] = cnv['cn'].reshape((-1, 2))
+    return { 'sv': sv, 'snv': snv, 'cnv': cnv }
+
+
+# output: f (file) text lines of fname. gzip and bgzip files are decompressed
+def _open(fname):
+    with open(fname, 'rb') as f:
+        magic = f.read(2)
+    if magic != GZIP_MAGIC:
+        return open(fname, 'r')
+    f = io.BufferedReader(gzip.open(fname, 'rb'))
+    if sys.version_info[0] >= 3:
+        f = io.TextIOWrapper(f)
+    return f
+
+
+# output: col (dict) key is FORMAT key. val is its column in the sample field. cached in fmt_cols
+def _format_cols(fmt_cols, fmt):
+    if fmt not in fmt_cols:
+        fmt_cols[fmt] = dict([ (key, i) for i, key in enumerate(fmt.split(':')) ])
+    return fmt_cols[fmt]
+
+
+# output: info (dict) key is INFO key. val (str) its value. flags are left out
+def _parse_info(info):
+    return dict([ kv.split('=', 1) for kv in info.split(';') if '=' in kv ])
+
+
+#  input: alt (str) first ALT of a paired breakend record. ex. N[1:360236[ or ]1:54989877]N
+# output: mate_chr (str) chromosome of the mate. the <> of a contig outside the main assembly are removed
+#         mate_pos (int) position of the mate
+#         remote_orientation (bool) True if the brackets are [. same as PyVCF's _Breakend.remoteOrientation
+def _parse_breakend(alt):
+    i = min([ k for k in [ alt.find('['), alt.find(']') ] if k >= 0 ])
+    j = max(alt.find('[', i + 1), alt.find(']', i + 1))
+    coords = alt[i + 1:j].split(':')
+    mate_chr = coords[0][1:-1] if coords[0][0] == '<' else coords[0]
+    return mate_chr, coords[1], '[' in alt
+
+
+# output: x (float) first value of the FORMAT field in column col. nan if it is missing
+def _first_number(fields, col):
+    if col is None or col >= len(fields):
+        return np.nan
+    return _to_float(fields[col].split(',')[0])
+
+
+def _to_float(x):
+    return np.nan if x == MISSING or x == '' else float(x)
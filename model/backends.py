@@ -0,0 +1,213 @@
+#     file: backends.py
+#  purpose: MILP backends that solve a matrix_builder.MatrixModel. 'gurobi' keeps one gurobipy model that is updated in
+#           place between solves and warm started from the last solution. 'cbc' solves with the open source CBC
+#           solver through pulp and needs no license, so runs are not limited by seats
+
+
+# # # # # # # # # # #
+#   I M P O R T S   #
+# # # # # # # # # # #
+
+import time
+import numpy as np
+
+try:
+    import gurobipy as gp
+except ImportError:  # only the open source backends are available
+    gp = None
+
+try:
+    import pulp
+except ImportError:  # no cbc backend
+    pulp = None
+
+
+# # # # # # # # # # # # #
+#   C O N S T A N T S   #
+# # # # # # # # # # # # #
+
+BACKENDS = [ 'gurobi', 'cbc' ]
+
+
+# # # # # # # # # # # # #
+#   F U N C T I O N S   #
+# # # # # # # # # # # # #
+
+#  input: name (str) one of BACKENDS
+#         time_limit (int or None) maximum number of seconds of each solve
+#         mip_gap (float or None) relative MIP gap at which each solve stops. None keeps the solver default
+# output: backend (GurobiBackend or CbcBackend)
+def get_backend(name, time_limit = None, mip_gap = None):
+    if name == 'cbc':
+        return CbcBackend(time_limit, mip_gap)
+    return GurobiBackend(time_limit, mip_gap)
+
+
+# output: names (list of str) the BACKENDS whose solver can be imported here
+def available_backends():
+    names = []
+    for name in BACKENDS:
+        try:
+            get_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+# every backend has load(mm) to set up the model, update(mm, names) to replace the named constraint families with their
+#   current blocks in mm, set_start(x) to start the next solve from x (nan for unknown values), clear_start() to start
+#   the next solve from nothing and solve(callback, time_limit) returning (obj_val, sol). a time_limit given to solve replaces
+#   the one of the backend for that solve. obj_val (float or None) and sol (np.array of float or None) [mm.num_vars]
+#   are None if no solution was found. runtime (float) is the number of seconds of the last solve and is_optimal (bool)
+#   is True if it was solved to optimality. stats (dict) describes the last solve: status, obj_val, bound, gap, nodes
+#   and trajectory, a list of [seconds, incumbent, bound] each time the incumbent or bound moved (only recorded by gurobi)
+
+class GurobiBackend:
+
+    def __init__(self, time_limit = None, mip_gap = None):
+        if gp is None:
+            raise ImportError('the gurobi backend needs gurobipy. use the cbc backend instead')
+        self.time_limit, self.mip_gap = time_limit, mip_gap
+        self.mod = None
+        self.start = None
+        self.runtime, self.is_optimal, self.stats = 0.0, False, {}
+
+    #  input: mm (MatrixModel) model to load into a new gurobi model
+    def load(self, mm):
+        self.mod = gp.Model('tusv')
+        self.x = self.mod.addMVar(mm.num_vars, lb = mm.lb(), ub = mm.ub(), vtype = mm.vtype())
+        self.constrs = {}
+        for name in mm.blocks:
+            self.constrs[name] = self._add_constrs(mm, name)
+        self.mod.setMObjective(None, mm.obj(), 0.0, xc = self.x, sense = gp.GRB.MINIMIZE)
+        self.is_cont = mm.vtype() == 'C'
+        self.mod.params.MIPFocus = 1
+        if self.mip_gap != None:
+            self.mod.params.MIPGap = self.mip_gap
+
+    def set_start(self, x):
+        self.start = np.where(np.isnan(x), gp.GRB.UNDEFINED, x)
+
+    # the start of the last solve stays on the variables, so it is undefined rather than only forgotten
+    def clear_start(self):
+        self.start = None
+        if self.mod is not None:
+            self.x.Start = np.full(self.x.shape, gp.GRB.UNDEFINED)
+
+    def update(self, mm, names):
+        for name in names:
+            if self.constrs[name] is not None:
+                self.mod.remove(self.constrs[name])
+            self.constrs[name] = self._add_constrs(mm, name)
+
+    #  input: callback (function or None) gurobi callback called after the trajectory is recorded
+    def solve(self, callback = None, time_limit = None):
+        time_limit = self.time_limit if time_limit is None else time_limit
+        self.mod.params.TimeLimit = gp.GRB.INFINITY if time_limit is None else time_limit
+        if self.start is not None:
+            self.x.Start = self.start
+        trajectory = []
+        def track(model, where):
+            if where == gp.GRB.Callback.MIP:
+                point = [ model.cbGet(gp.GRB.Callback.RUNTIME), model.cbGet(gp.GRB.Callback.MIP_OBJBST), model.cbGet(gp.GRB.Callback.MIP_OBJBND) ]
+                if not trajectory or trajectory[-1][1:] != point[1:]:
+                    trajectory.append(point)
+            if callback is not None:
+                callback(model, where)
+        self.mod.optimize(track)
+
+        mod = self.mod
+        self.runtime, self.is_optimal = mod.Runtime, mod.Status == gp.GRB.OPTIMAL
+        self.stats = { 'status': mod.Status, 'nodes': mod.NodeCount, 'trajectory': trajectory, 'obj_val': None, 'bound': None, 'gap': None }
+        if mod.SolCount == 0:
+            return None, None
+        if mod.IsMIP:
+            self.stats.update({ 'obj_val': mod.ObjVal, 'bound': mod.ObjBound, 'gap': mod.MIPGap })
+        else:  # an LP (get_U) has no MIP bound or gap
+            self.stats.update({ 'obj_val': mod.ObjVal, 'bound': mod.ObjVal, 'gap': 0.0 })
+        sol = self.x.X
+        self.start = np.where(self.is_cont, gp.GRB.UNDEFINED, sol)  # continuous variables depend on U. gurobi completes them
+        return mod.ObjVal, sol
+
+    def _add_constrs(self, mm, name):
+        A, sense, rhs = mm.blocks[name]
+        if A.shape[0] == 0:
+            return None
+        senses = { '<=': gp.GRB.LESS_EQUAL, '>=': gp.GRB.GREATER_EQUAL, '==': gp.GRB.EQUAL }
+        if hasattr(self.mod, 'addMConstr'):
+            return self.mod.addMConstr(mm.matrix(name), self.x, senses[sense], rhs)
+        return self.mod.addMConstrs(mm.matrix(name), self.x, senses[sense], rhs)  # gurobi 9.0 named it addMConstrs
+
+
+class CbcBackend:
+
+    def __init__(self, time_limit = None, mip_gap = None):
+        if pulp is None or not pulp.PULP_CBC_CMD().available():
+            raise ImportError('the cbc backend needs pulp with its cbc binary (pip install pulp)')
+        self.time_limit, self.mip_gap = time_limit, mip_gap
+        self.prob = None
+        self.runtime, self.is_optimal, self.stats = 0.0, False, {}
+
+    # the pulp problem is built once and its constraint families are replaced in place, like the gurobi model. pulp
+    #   still writes the whole problem for the cbc command on every solve
+    def load(self, mm):
+        lb, ub, vtype, c = mm.lb(), mm.ub(), mm.vtype(), mm.obj()
+        self.x = [ pulp.LpVariable('x' + str(j), _finite(lb[j]), _finite(ub[j]), 'Continuous' if vtype[j] == 'C' else 'Integer') for j in range(mm.num_vars) ]
+        self.c = c
+        self.prob = pulp.LpProblem('tusv', pulp.LpMinimize)
+        self.prob += pulp.LpAffineExpression([ (self.x[j], float(c[j])) for j in np.nonzero(c)[0] ])
+        self.rows = {}  # key is constraint family name. val is the names of its constraints in the pulp problem
+        for name in mm.blocks:
+            self._add_constrs(mm, name)
+
+    def update(self, mm, names):
+        for name in names:
+            for row in self.rows.pop(name):
+                del self.prob.constraints[row]
+            self._add_constrs(mm, name)
+
+    def set_start(self, x):  # not every pulp version passes a start to cbc
+        pass
+
+    def clear_start(self):
+        pass
+
+    #  input: callback is not supported by CBC and is ignored
+    #  notes: the time limit and gap are passed as cbc options, which every pulp version forwards to the cbc command
+    def solve(self, callback = None, time_limit = None):
+        options = []
+        time_limit = self.time_limit if time_limit is None else time_limit
+        if time_limit is not None:
+            options.append('sec ' + str(time_limit))
+        if self.mip_gap is not None:
+            options.append('ratio ' + str(self.mip_gap))
+
+        prob = self.prob
+        t = time.time()
+        prob.solve(pulp.PULP_CBC_CMD(msg = 0, options = options))
+        self.runtime, self.is_optimal = time.time() - t, prob.sol_status == pulp.LpSolutionOptimal
+        self.stats = { 'status': pulp.LpSolution[prob.sol_status], 'nodes': None, 'trajectory': [], 'obj_val': None, 'bound': None, 'gap': None }
+        if prob.sol_status not in [ pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible ]:
+            return None, None
+        sol = np.array([ v.value() for v in self.x ], dtype = float)
+        obj_val = self.c.dot(sol)
+        self.stats['obj_val'] = obj_val
+        return obj_val, sol
+
+    def _add_constrs(self, mm, name):
+        A, sense, rhs = mm.blocks[name]
+        A = mm.matrix(name)
+        senses = { '<=': pulp.LpConstraintLE, '>=': pulp.LpConstraintGE, '==': pulp.LpConstraintEQ }
+        self.rows[name] = []
+        for i in range(A.shape[0]):
+            row = slice(A.indptr[i], A.indptr[i + 1])
+            expr = pulp.LpAffineExpression([ (self.x[j], float(a)) for j, a in zip(A.indices[row], A.data[row]) ])
+            self.rows[name].append(name + '_' + str(i))
+            self.prob.addConstraint(pulp.LpConstraint(expr, senses[sense], rhs = float(rhs[i])), self.rows[name][-1])
+
+
+# pulp takes None for a missing bound
+def _finite(bound):
+    return float(bound) if np.isfinite(bound) else None
+
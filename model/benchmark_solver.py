@@ -0,0 +1,245 @@
+#     file: benchmark_solver.py
+#  purpose: Benchmarks for building and solving the get_C model on random instances with the phased
+#           layout used by tusv-int.py (F is [m, l+g+2r], C_RNA is [2n-1, 2r])
+#    usage: python model/benchmark_solver.py build -n 4 -l 40 -g 80 -r 100 -m 4
+#           python model/benchmark_solver.py extract -n 4 -l 40 -g 80 -r 100 -m 4
+#           python model/benchmark_solver.py formulation -n 3 -l 10 -g 20 -r 20
+#           python model/benchmark_solver.py symmetry -n 3 -i simulation_data/input/sample/ -f simulation_data/input/C_scRNA_CNVs.tsv
+#           python model/benchmark_solver.py init -n 2 -i simulation_data/input/sample/ -f simulation_data/input/C_scRNA_CNVs.tsv --restarts 5
+#           python model/benchmark_solver.py start -n 3 -i simulation_data/input/sample/ -f simulation_data/input/C_scRNA_CNVs.tsv
+
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import numpy as np
+import gurobipy as gp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'help'))
+import solver as sv
+import matrix_builder as mb
+import backends as bk
+import init_u as iu
+import telemetry as tl
+
+
+# # # # # # # # # # # # # # # # # # #
+#   R A N D O M   I N S T A N C E   #
+# # # # # # # # # # # # # # # # # # #
+
+#  input: m (int) number of samples. n (int) number of leaves. l (int) number of breakpoints (even).
+#         g (int) number of SNVs. r (int) number of segments. seed (int) seed of the instance
+# output: F_phasing, C_RNA, U, Q, G, Pi in the shapes expected by sv.get_C
+def gen_instance(m, n, l, g, r, seed = 0):
+    rs = np.random.RandomState(seed)
+    N = 2 * n - 1
+    Q = np.zeros((l + g, r))
+    Q[np.arange(l + g), rs.randint(0, r, l + g)] = 1
+    G = np.eye(l)
+    mates = rs.permutation(l).reshape((l // 2, 2))
+    G[mates[:, 0], mates[:, 1]] = 1
+    G[mates[:, 1], mates[:, 0]] = 1
+    F_phasing = np.hstack([ 0.5 * rs.rand(m, l + g), 1.0 + rs.rand(m, 2*r) ])
+    C_RNA = rs.randint(0, 3, (N, 2*r)).astype(float)
+    U = rs.rand(m, N)
+    U = U / U.sum(axis = 1)[:, np.newaxis]
+    F_seg = (F_phasing[:, l + g:-r] + F_phasing[:, -r:]).dot(np.transpose(Q))
+    Pi = sv.np_divide_0(F_phasing[:, :l + g], F_seg)
+    return F_phasing, C_RNA, U, Q, G, Pi
+
+
+# output: F_phasing, C_RNA, Q, G read from the .vcf files in args.input_directory like tusv-int.py does, or from a
+#           random instance if no input directory is given
+def load_instance(args):
+    if args.input_directory is None:
+        F_phasing, C_RNA, _, Q, G, _ = gen_instance(args.m, args.n, args.l, args.g, args.r, args.seed)
+        return F_phasing, C_RNA, Q, G
+    import generate_matrices as gm
+    mats = gm.get_mats(args.input_directory, args.scRNA_file, args.n, const = args.constant, sv_ub = args.sv_upperbound)
+    return mats[0], mats[16], mats[2], mats[4]
+
+
+# # # # # # # # # # # # # # #
+#   B E N C H M A R K S     #
+# # # # # # # # # # # # # # #
+
+# reports the time to build the get_C model with the element by element builder and the matrix builder
+def bench_build(args):
+    F_phasing, C_RNA, U, Q, G, Pi = gen_instance(args.m, args.n, args.l, args.g, args.r, args.seed)
+    printnow('instance: m=%d n=%d l=%d g=%d r=%d c_max=%d' % (args.m, args.n, args.l, args.g, args.r, args.c_max))
+    printnow('%-8s %10s %10s %10s' % ('builder', 'seconds', 'vars', 'constrs'))
+    for builder, make in [ ('loop', sv._get_C_loop_model), ('matrix', sv._get_C_matrix_model) ]:
+        times = []
+        for _ in xrange(0, args.repeats):
+            t = time.time()
+            mod, _ = make(F_phasing, C_RNA, U, Q, G, Pi, args.n, args.c_max, 1.0, 1.0)
+            mod.update()
+            times.append(time.time() - t)
+        printnow('%-8s %10.3f %10d %10d' % (builder, min(times), mod.NumVars, mod.NumConstrs))
+
+
+# reports the time to read the solution of a solved get_C model back into numpy arrays: one variable at a time, with
+#   one getAttr call on the element by element model, and from the flat variable vector of the matrix model. the
+#   models stop at their first feasible solution since only the reading is timed
+def bench_extract(args):
+    F_phasing, C_RNA, U, Q, G, Pi = gen_instance(args.m, args.n, args.l, args.g, args.r, args.seed)
+    printnow('instance: m=%d n=%d l=%d g=%d r=%d c_max=%d' % (args.m, args.n, args.l, args.g, args.r, args.c_max))
+    loop_mod, loop_vars = sv._get_C_loop_model(F_phasing, C_RNA, U, Q, G, Pi, args.n, args.c_max, 1.0, 1.0)
+    matrix_mod, (x, idx) = sv._get_C_matrix_model(F_phasing, C_RNA, U, Q, G, Pi, args.n, args.c_max, 1.0, 1.0)
+    for mod in [ loop_mod, matrix_mod ]:
+        mod.params.SolutionLimit = 1
+        mod.optimize()
+    readers = [ ('element', lambda: element_solution(*loop_vars)), ('getattr', lambda: sv._loop_solution(loop_mod, *loop_vars)),
+                ('matrix', lambda: sv._matrix_solution(x.X, idx)) ]
+    printnow('%-8s %10s' % ('reader', 'seconds'))
+    for reader, read in readers:
+        times = []
+        for _ in xrange(0, args.repeats):
+            t = time.time()
+            read()
+            times.append(time.time() - t)
+        printnow('%-8s %10.4f' % (reader, min(times)))
+
+
+# output: same as sv._loop_solution, reading the value of one gurobi variable at a time
+def element_solution(M, C, E, A, R, W):
+    Xs = [ np.array([ x.X for x in X.ravel() ]).reshape(X.shape) for X in [ M, C, E, A, R, W ] ]
+    return Xs[:5] + [ np.rint(Xs[5]).astype(int).sum(axis = 0) ]
+
+
+# reports the size of the get_C model and the time to build and solve it with each copy number indicator encoding
+def bench_formulation(args):
+    F_phasing, C_RNA, Q, G = load_instance(args)
+    np.random.seed(args.seed)
+    U = sv.gen_U(len(F_phasing), args.n)
+    printnow('%-8s %10s %10s %10s %10s %10s %12s %8s' % ('encoding', 'vars', 'binaries', 'integers', 'constrs', 'build', 'obj', 'solve'))
+    for formulation in mb.FORMULATIONS:
+        c_solver = sv.CSolver(F_phasing, C_RNA, Q, G, args.n, args.c_max, args.lambda1, args.lambda2, args.time_limit, formulation = formulation, backend = args.backend)
+        t = time.time()
+        obj_val = c_solver.solve(U)[0]
+        runtime = c_solver.backend.runtime
+        t_build = time.time() - t - runtime  # building and extracting the solution
+        vtype = c_solver.mm.vtype()
+        printnow('%-8s %10d %10d %10d %10d %10.3f %12.4f %8.2f' % (formulation, len(vtype), np.sum(vtype == 'B'), np.sum(vtype == 'I'), c_solver.mm.num_constrs(), t_build, obj_val, runtime))
+
+
+# reports the time until the get_C MIP gap first falls below each of args.gaps with and without symmetry breaking.
+#   gurobi only since it tracks the gap with a gurobi callback.
+#   U is taken from one coordinate descent step so that it has the zero columns get_U produces
+def bench_symmetry(args):
+    F_phasing, C_RNA, Q, G = load_instance(args)
+    m, l = len(F_phasing), len(G)
+    gaps = [ float(x) for x in args.gaps.split(',') ]
+    np.random.seed(args.seed)
+    C = sv.get_C(F_phasing, C_RNA, sv.gen_U(m, args.n), Q, G, None, None, args.n, args.c_max, args.lambda1, args.lambda2, args.time_limit)[2]
+    U = sv.get_U(F_phasing, C, args.n, l, args.only_leaf, args.backend)[0]
+
+    printnow('%-9s %12s %8s %8s %10s ' % ('symmetry', 'obj', 'gap', 'seconds', 'nodes') + ' '.join([ 'gap<=%-6g' % gap for gap in gaps ]))
+    for symmetry in [ False, True ]:
+        c_solver = sv.CSolver(F_phasing, C_RNA, Q, G, args.n, args.c_max, args.lambda1, args.lambda2, args.time_limit, symmetry)
+        printnow('%-9s ' % symmetry + time_to_gaps(c_solver, U, gaps))
+
+
+# reports the time until the get_C MIP gap first falls below each of args.gaps when gurobi starts from the solution
+#   built from the scRNA clones (mb.rna_start) and when it starts from nothing. U is taken like in bench_symmetry
+def bench_start(args):
+    F_phasing, C_RNA, Q, G = load_instance(args)
+    m, l = len(F_phasing), len(G)
+    gaps = [ float(x) for x in args.gaps.split(',') ]
+    np.random.seed(args.seed)
+    C = sv.get_C(F_phasing, C_RNA, sv.gen_U(m, args.n), Q, G, None, None, args.n, args.c_max, args.lambda1, args.lambda2, args.time_limit)[2]
+    U = sv.get_U(F_phasing, C, args.n, l, args.only_leaf, args.backend)[0]
+
+    printnow('%-9s %12s %8s %8s %10s ' % ('rna_start', 'obj', 'gap', 'seconds', 'nodes') + ' '.join([ 'gap<=%-6g' % gap for gap in gaps ]))
+    for rna_start in [ False, True ]:
+        c_solver = sv.CSolver(F_phasing, C_RNA, Q, G, args.n, args.c_max, args.lambda1, args.lambda2, args.time_limit)
+        printnow('%-9s ' % rna_start + time_to_gaps(c_solver, U, gaps, rna_start))
+
+
+# output: row (str) objective, final gap, seconds and nodes of solving c_solver at U, and the seconds until the MIP gap
+#           first fell below each of gaps ('-' if it never did)
+def time_to_gaps(c_solver, U, gaps, rna_start = False):
+    reached = {}
+    def track_gap(model, where):
+        if where == gp.GRB.Callback.MIP:
+            best, bound = model.cbGet(gp.GRB.Callback.MIP_OBJBST), model.cbGet(gp.GRB.Callback.MIP_OBJBND)
+            if best < gp.GRB.INFINITY:
+                for gap in gaps:
+                    if gap not in reached and abs(best - bound) <= gap * abs(best):
+                        reached[gap] = model.cbGet(gp.GRB.Callback.RUNTIME)
+    obj_val = c_solver.solve(U, track_gap, rna_start = rna_start)[0]
+    mod = c_solver.backend.mod
+    for gap in gaps:
+        if gap not in reached and mod.MIPGap <= gap:
+            reached[gap] = mod.Runtime
+    times = [ '%10.2f' % reached[gap] if gap in reached else '%10s' % '-' for gap in gaps ]
+    return '%12.4f %8.4f %8.2f %10d ' % (obj_val, mod.MIPGap, mod.Runtime, mod.NodeCount) + ' '.join(times)
+
+
+# reports the number of coordinate descent iterations until get_UCE stops and the final objective value of
+#   args.restarts restarts from each initial U strategy. restart r of every strategy uses seed args.seed + r
+def bench_init(args):
+    F_phasing, C_RNA, Q, G = load_instance(args)
+    fname = tempfile.mkstemp(suffix = '.jsonl')[1]
+    printnow('%-8s %10s %12s %12s %10s' % ('init', 'iters', 'mean obj', 'best obj', 'seconds'))
+    try:
+        for init in iu.STRATEGIES:
+            telemetry = tl.Telemetry(fname)
+            c_solver = sv.CSolver(F_phasing, C_RNA, Q, G, args.n, args.c_max, args.lambda1, args.lambda2, args.time_limit, backend = args.backend)
+            t = time.time()
+            for r in xrange(0, args.restarts):
+                sv.get_UCE(F_phasing, C_RNA, Q, G, None, None, args.n, args.c_max, args.lambda1, args.lambda2, args.iters, args.time_limit, args.only_leaf,
+                           seed = args.seed + r, c_solver = c_solver, telemetry = telemetry, restart = r, init = init, init_noise = args.init_noise)
+            t = time.time() - t
+            stops = [ rec for rec in map(json.loads, open(fname)) if rec['event'] == 'get_UCE' and rec['obj_val'] is not None ]
+            iters, objs = [ rec['iterations'] for rec in stops ], [ rec['obj_val'] for rec in stops ]
+            printnow('%-8s %10.2f %12.4f %12.4f %10.2f' % (init, np.mean(iters), np.mean(objs), np.min(objs), t))
+    finally:
+        os.remove(fname)
+
+
+def printnow(s):
+    sys.stdout.write(s + '\n')
+    sys.stdout.flush()
+
+
+def get_args(argv):
+    parser = argparse.ArgumentParser(prog = 'benchmark_solver.py', description = 'benchmarks for the get_C model')
+    parser.add_argument('benchmark', choices = sorted(BENCHMARKS.keys()), help = 'benchmark to run')
+    parser.add_argument('-m', default = 4, type = int, help = 'number of samples')
+    parser.add_argument('-n', default = 4, type = int, help = 'number of leaves')
+    parser.add_argument('-l', default = 40, type = int, help = 'number of breakpoints (even)')
+    parser.add_argument('-g', default = 80, type = int, help = 'number of SNVs')
+    parser.add_argument('-r', default = 100, type = int, help = 'number of segments')
+    parser.add_argument('-c', '--c_max', default = 10, type = int, help = 'maximum copy number')
+    parser.add_argument('--repeats', default = 3, type = int, help = 'number of repeats. the fastest is reported')
+    parser.add_argument('--seed', default = 0, type = int, help = 'seed of the random instance')
+    parser.add_argument('-i', '--input_directory', default = None, help = 'directory of .vcf files to benchmark on instead of a random instance')
+    parser.add_argument('-f', '--scRNA_file', default = None, help = 'scRNA .tsv file of the input directory')
+    parser.add_argument('-C', '--constant', default = 120, type = int, help = 'scaling constant for sampling SNVs')
+    parser.add_argument('-sv_ub', '--sv_upperbound', default = 80, type = int, help = 'scaling constant for sampling SVs')
+    parser.add_argument('--lambda1', default = 0.25, type = float, help = 'weight of the tree cost')
+    parser.add_argument('--lambda2', default = 6.25, type = float, help = 'weight of the breakpoint frequency error')
+    parser.add_argument('-t', '--time_limit', default = 60, type = int, help = 'time limit (seconds) of each solve')
+    parser.add_argument('--gaps', default = '0.5,0.2,0.1,0.01', help = 'comma separated MIP gaps to report the time to')
+    parser.add_argument('--backend', default = 'gurobi', choices = bk.BACKENDS, help = 'MILP solver')
+    parser.add_argument('--only_leaf', action = 'store_true', help = 'only leaves have nonzero frequencies in U')
+    parser.add_argument('--restarts', default = 5, type = int, help = 'number of restarts of each initial U strategy')
+    parser.add_argument('--iters', default = 10, type = int, help = 'maximum number of coordinate descent iterations')
+    parser.add_argument('--init_noise', default = 0.0, type = float, help = 'weight of a random U mixed into the data driven initial U')
+    return parser.parse_args(argv)
+
+
+BENCHMARKS = { 'build': bench_build, 'extract': bench_extract, 'formulation': bench_formulation, 'init': bench_init, 'start': bench_start, 'symmetry': bench_symmetry }
+
+
+def main(argv):
+    gp.setParam('OutputFlag', 0)
+    args = get_args(argv)
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,159 @@
+#     file: benchmark_vcf.py
+#  purpose: Benchmark of reading the input .vcf files. Writes a synthetic sample .vcf in the layout of
+#           simulation_data (breakend pairs, SNVs and copy number segments on 22 chromosomes), plain and gzipped,
+#           and reports the time vcf_reader.read_sample and PyVCF's vcf.Reader take to pull out the fields
+#           generate_matrices.get_sample_dict uses. checks that both give the same values
+#    usage: python model/benchmark_vcf.py --records 1000000
+#           python model/benchmark_vcf.py -f simulation_data/input/sample/sample1.vcf
+
+import os
+import sys
+import gzip
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'help'))
+import vcf_reader as vr
+
+try:
+    import vcf
+except ImportError:  # only the streaming reader is timed
+    vcf = None
+
+
+# # # # # # # # # # # # #
+#   C O N S T A N T S   #
+# # # # # # # # # # # # #
+
+NUM_CHROMS = 22
+CHROM_LEN = 100000000
+HEADER = """##fileformat=VCFv4.2
+##INFO=<ID=END,Number=1,Type=Integer,Description="End position of the variant described in this record">
+##INFO=<ID=IMPRECISE,Number=0,Type=Flag,Description="Imprecise structural variation">
+##INFO=<ID=MATEID,Number=.,Type=String,Description="ID of mate breakends">
+##INFO=<ID=SVTYPE,Number=1,Type=String,Description="Type of structural variant">
+##FORMAT=<ID=GT,Number=1,Type=Integer,Description="Genotype">
+##FORMAT=<ID=CN,Number=2,Type=Integer,Description="Copy number genotype for imprecise events">
+##FORMAT=<ID=CNADJ,Number=.,Type=Integer,Description="Copy number of adjacency">
+##FORMAT=<ID=BDP,Number=1,Type=Integer,Description="Depth of split reads">
+##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read depth">
+##ALT=<ID=CNV,Description="Copy number variable region">
+#CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO	FORMAT	TUMOR	NORMAL
+"""
+
+
+# # # # # # # # # # # # #
+#   F U N C T I O N S   #
+# # # # # # # # # # # # #
+
+def main(argv):
+    args = get_args(argv)
+    d = tempfile.mkdtemp()
+    try:
+        fname = args.vcf_file
+        if fname is None:
+            fname = os.path.join(d, 'sample.vcf')
+            write_vcf(fname, args.records, args.seed)
+        gz_fname = os.path.join(d, 'sample.vcf.gz')
+        with open(fname, 'rb') as f_in:
+            with gzip.open(gz_fname, 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out)
+        printnow('%d records, %.1f MB' % (count_records(fname), os.path.getsize(fname) / 1024.0 ** 2))
+        printnow('%-8s %-8s %10s' % ('reader', 'file', 'seconds'))
+        for name, path in [ ('vcf', fname), ('vcf.gz', gz_fname) ]:
+            t = time.time()
+            recs = vr.read_sample(path)
+            printnow('%-8s %-8s %10.2f' % ('stream', name, time.time() - t))
+            if vcf is not None:
+                t = time.time()
+                py_recs = pyvcf_sample(path)
+                printnow('%-8s %-8s %10.2f' % ('pyvcf', name, time.time() - t))
+                printnow('same values: ' + str(same_records(recs, py_recs)))
+    finally:
+        shutil.rmtree(d)
+
+
+#  input: fname (str) .vcf file to write
+#         num_records (int) about this many records are written. a tenth are SNVs, a tenth copy number segments
+#           and the rest breakend pairs
+def write_vcf(fname, num_records, seed):
+    rs = np.random.RandomState(seed)
+    num_cnv, num_snv = num_records // 10, num_records // 10
+    num_pairs = (num_records - num_cnv - num_snv) // 2
+    lines = []
+    for c in xrange(0, NUM_CHROMS):
+        bgn = 0
+        for e in np.unique(rs.randint(1, CHROM_LEN, num_cnv // NUM_CHROMS)):
+            lines.append((c + 1, bgn, 'cnv%d\t.\t<CNV>\t.\tPASS\tEND=%d;IMPRECISE\tGT:CN\t1|1:%.2f,%.2f\t0|0:1,1' % (len(lines), e, rs.rand() * 3, rs.rand() * 3)))
+            bgn = e + 1
+    chroms, poss = rs.randint(1, NUM_CHROMS + 1, (2, num_pairs)), rs.randint(1, CHROM_LEN, (2, num_pairs))
+    for k in xrange(0, num_pairs):
+        ids = ('sv%d' % (2 * k), 'sv%d' % (2 * k + 1))
+        for a in xrange(0, 2):
+            b = 1 - a
+            alt = '[%d:%d[' % (chroms[b, k], poss[b, k]) if rs.rand() < 0.5 else ']%d:%d]' % (chroms[b, k], poss[b, k])
+            lines.append((chroms[a, k], poss[a, k], '%s\t.\t%s\t.\tPASS\tMATEID=%s;SVTYPE=BND\tGT:CNADJ:BDP:DP\t1|0:%.2f:0:0\t0|0:0:0:0' % (ids[a], alt, ids[b], rs.rand())))
+    for k in xrange(0, num_snv):
+        lines.append((rs.randint(1, NUM_CHROMS + 1), rs.randint(1, CHROM_LEN), 'snv%d\t.\tN\t.\tPASS\t.\tGT:CNADJ\t0|1:%.2f\t0|0:0' % (k, rs.rand())))
+    lines.sort(key = lambda x: (x[0], x[1]))
+    with open(fname, 'w') as f:
+        f.write(HEADER)
+        for chrom, pos, rest in lines:
+            f.write('%d\t%d\t%s\n' % (chrom, pos, rest))
+
+
+# output: recs (dict) same as vr.read_sample, read with PyVCF
+def pyvcf_sample(fname):
+    recs = { 'sv': dict([ (key, []) for key in [ 'id', 'chrom', 'pos', 'cnadj', 'mate_id', 'mate_chr', 'mate_pos', 'remote_orientation' ] ]),
+             'snv': { 'chrom': [], 'pos': [], 'cnadj': [] }, 'cnv': { 'chrom': [], 'pos': [], 'end': [], 'cn': [] } }
+    sv, snv, cnv = recs['sv'], recs['snv'], recs['cnv']
+    for rec in vcf.Reader(filename = fname):
+        if rec.ID[0:2] == vr.SV_PREFIX:
+            for key, val in [ ('id', rec.ID), ('chrom', rec.CHROM), ('pos', rec.POS), ('cnadj', rec.samples[0].data.CNADJ[0]), ('mate_id', rec.INFO['MATEID'][0]),
+                              ('mate_chr', rec.ALT[0].chr), ('mate_pos', rec.ALT[0].pos), ('remote_orientation', rec.ALT[0].remoteOrientation) ]:
+                sv[key].append(val)
+        elif rec.ID[0:3] == vr.SNV_PREFIX:
+            for key, val in [ ('chrom', rec.CHROM), ('pos', rec.POS), ('cnadj', rec.samples[0].data.CNADJ[0]) ]:
+                snv[key].append(val)
+        elif rec.ID[0:3] == vr.CNV_PREFIX:
+            end = rec.INFO['END'][0] if isinstance(rec.INFO['END'], list) else rec.INFO['END']
+            for key, val in [ ('chrom', rec.CHROM), ('pos', rec.POS), ('end', end), ('cn', rec.samples[0].data.CN) ]:
+                cnv[key].append(val)
+    return recs
+
+
+def same_records(recs, py_recs):
+    for kind in recs:
+        for key in recs[kind]:
+            a, b = recs[kind][key], py_recs[kind][key]
+            if isinstance(a, np.ndarray):
+                if not np.allclose(a, np.array(b, dtype = float).reshape(a.shape)):
+                    return False
+            elif list(a) != [ str(x) for x in b ]:
+                return False
+    return True
+
+
+def count_records(fname):
+    with open(fname) as f:
+        return sum([ 1 for line in f if line[0] != '#' ])
+
+
+def printnow(s):
+    sys.stdout.write(s + '\n')
+    sys.stdout.flush()
+
+
+def get_args(argv):
+    parser = argparse.ArgumentParser(prog = 'benchmark_vcf.py', description = 'benchmark of reading the input .vcf files')
+    parser.add_argument('--records', default = 1000000, type = int, help = 'number of records of the synthetic .vcf')
+    parser.add_argument('--seed', default = 0, type = int, help = 'seed of the synthetic .vcf')
+    parser.add_argument('-f', '--vcf_file', default = None, help = '.vcf file to benchmark on instead of a synthetic one')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,63 @@
+#     file: checkpoint.py
+#  purpose: Checkpoints of a run so that an evicted job can be resumed with --resume. unmix keeps the parsed input
+#           matrices and get_UCE keeps the state of its coordinate descent after every iteration. each checkpoint is
+#           one pickle written to a temporary file and renamed into place, so a job killed while writing keeps the
+#           previous checkpoint
+
+
+# # # # # # # # # # #
+#   I M P O R T S   #
+# # # # # # # # # # #
+
+import os
+import shutil
+import pickle
+import tempfile
+
+
+# # # # # # # # # # # # #
+#   C O N S T A N T S   #
+# # # # # # # # # # # # #
+
+CHECKPOINT_DIR = 'checkpoint'   # subdirectory of the output directory
+INPUTS_FNAME = 'inputs.pkl'
+
+
+# # # # # # # # # # # # #
+#   F U N C T I O N S   #
+# # # # # # # # # # # # #
+
+#  input: out_dir (str) output directory of the run
+#         resume (bool) keep the checkpoints of an earlier run. they are deleted otherwise
+# output: d (str) checkpoint directory of the run
+def get_dir(out_dir, resume):
+    d = os.path.join(out_dir, CHECKPOINT_DIR)
+    if not resume and os.path.isdir(d):
+        shutil.rmtree(d)
+    if not os.path.isdir(d):
+        os.mkdir(d)
+    return d
+
+
+#  input: fname (str) .pkl file to write
+#         state (object) anything pickle can write
+def save(fname, state):
+    fd, tmp_fname = tempfile.mkstemp(prefix = '.partial_', dir = os.path.dirname(fname))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_fname, fname)
+    except:
+        os.remove(tmp_fname)
+        raise
+
+
+# output: state (object or None) what was saved to fname. None if there is no checkpoint or it cannot be read
+def load(fname):
+    if fname is None or not os.path.isfile(fname):
+        return None
+    try:
+        with open(fname, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
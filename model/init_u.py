@@ -0,0 +1,85 @@
+#     file: init_u.py
+#  purpose: Initial U of the coordinate descent in get_UCE. 'random' draws every row uniformly from the simplex like
+#           solver.gen_U. 'nmf' and 'kmeans' derive the mixture fractions from F_phasing, so that the first get_C
+#           starts close to a sensible mixture. random draws come from np.random, which get_UCE seeds per restart, so
+#           every restart gets a different start
+
+
+# # # # # # # # # # #
+#   I M P O R T S   #
+# # # # # # # # # # #
+
+import numpy as np
+
+
+# # # # # # # # # # # # #
+#   C O N S T A N T S   #
+# # # # # # # # # # # # #
+
+STRATEGIES = [ 'random', 'nmf', 'kmeans' ]
+NMF_ITERS = 200
+KMEANS_ITERS = 50
+EPS = 1e-12
+
+
+# # # # # # # # # # # # #
+#   F U N C T I O N S   #
+# # # # # # # # # # # # #
+
+#  input: strategy (str) one of STRATEGIES
+#         F_phasing (np.array of float) [m, L] mixed copy numbers of the samples
+#         n (int) number of leaves. 2n-1 is total number of nodes
+#         only_leaf (bool) only leaves (and the root) get nonzero fractions from the data driven strategies
+#         noise (float) 0 <= noise <= 1. weight of a uniformly random U mixed into the data driven U. higher values make
+#           restarts with the same strategy differ more
+# output: U (np.array of float) [m, 2n-1] rows sum to 1
+def init_U(strategy, F_phasing, n, only_leaf=False, noise=0.0):
+    m = len(F_phasing)
+    N = 2 * n - 1
+    if strategy == 'random':
+        return _random_U(m, N)
+    nodes = np.append(np.arange(0, n), N - 1) if only_leaf else np.arange(0, N)
+    X = F_phasing / np.maximum(np.mean(F_phasing, 0), EPS)  # every mutation and segment on the same scale
+    if strategy == 'nmf':
+        W = _nmf_weights(X, len(nodes))
+    else:
+        W = _kmeans_weights(X, len(nodes))
+    U = np.zeros((m, N))
+    U[:, np.random.permutation(nodes)] = W  # components are given to nodes at random since node labels are arbitrary
+    U = (1.0 - noise) * _normalize(U) + noise * _random_U(m, N)
+    return _normalize(U)
+
+
+# output: W (np.array of float) [m, k] sample weights of a rank k nonnegative factorization X ~ W H with the
+#           multiplicative updates of Lee and Seung, from a random start
+def _nmf_weights(X, k):
+    m, L = X.shape
+    W = np.random.rand(m, k) + EPS
+    H = np.random.rand(k, L) + EPS
+    for _ in xrange(0, NMF_ITERS):
+        H *= W.T.dot(X) / (W.T.dot(W).dot(H) + EPS)
+        W *= X.dot(H.T) / (W.dot(H).dot(H.T) + EPS)
+    return W
+
+
+# output: W (np.array of float) [m, k] mean abundance in each sample of the k clusters of columns of X. columns are
+#           clustered by their profile across samples with k-means, from k distinct random columns
+def _kmeans_weights(X, k):
+    m, L = X.shape
+    cols = np.transpose(X)
+    centers = cols[np.random.choice(L, k, replace = L < k)]
+    for _ in xrange(0, KMEANS_ITERS):
+        labels = np.argmin(((cols[:, np.newaxis, :] - centers[np.newaxis, :, :]) ** 2).sum(axis = 2), axis = 1)
+        new_centers = np.array([ cols[labels == c].mean(axis = 0) if np.any(labels == c) else centers[c] for c in xrange(0, k) ])
+        if np.allclose(new_centers, centers):
+            break
+        centers = new_centers
+    return np.transpose(centers) + EPS
+
+
+def _random_U(m, N):
+    return _normalize(np.random.rand(m, N))
+
+
+def _normalize(U):
+    return U / np.sum(U, 1)[:, np.newaxis]
@@ -0,0 +1,556 @@
+#     file: matrix_builder.py
+#  purpose: Vectorized construction of the get_C model and the get_U LP. Every variable family is a block of columns in one
+#           flat variable vector and every constraint family is one sparse coefficient matrix, so a backend in
+#           backends.py loads the model with one call per constraint family instead of one call per element
+
+
+# # # # # # # # # # #
+#   I M P O R T S   #
+# # # # # # # # # # #
+
+import math
+import numpy as np
+import scipy.sparse as sp
+
+from collections import OrderedDict
+
+
+# # # # # # # # # # # # #
+#   C O N S T A N T S   #
+# # # # # # # # # # # # #
+
+FORMULATIONS = [ 'bits', 'bigm' ]  # encodings of the copy number indicators. see build_C_model
+MATCHINGS = [ 'milp', 'hungarian' ]  # ways of matching nodes to scRNA clones. see build_C_model
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # #
+#   M A T R I X   M O D E L   C L A S S         #
+# # # # # # # # # # # # # # # # # # # # # # # # #
+
+class MatrixModel:
+
+    def __init__(self):
+        self.num_vars = 0
+        self.blocks = OrderedDict() # key is block name. val is (A (scipy.sparse.csr_matrix), sense (str), rhs (np.array))
+        self._lbs, self._ubs, self._vtypes, self._sizes = [], [], [], []
+        self._obj_cols, self._obj_vals = [], []
+
+    #  input: shape (tuple of int) shape of the array of variables
+    #         lb (float) lower bound of every variable in the array
+    #         ub (float) upper bound of every variable in the array
+    #         vtype (str) 'C' continuous, 'B' binary or 'I' integer
+    # output: idx (np.array of int) [shape] column of each variable in the flat variable vector
+    def add_vars(self, shape, lb = 0.0, ub = np.inf, vtype = 'C'):
+        size = int(np.prod(shape))
+        idx = np.arange(self.num_vars, self.num_vars + size).reshape(shape)
+        self.num_vars += size
+        self._lbs.append(lb)
+        self._ubs.append(ub)
+        self._vtypes.append(vtype)
+        self._sizes.append(size)
+        return idx
+
+    #  input: name (str) unique name of the constraint family
+    #         shape (tuple of int) shape of the array of constraints in the family
+    #         terms (list of tuple) (cols, coefs) where cols (np.array of int) are variable columns and coefs (float or
+    #           np.array of float) their coefficients. both broadcast to shape, or to shape + (k,) for a sum over k
+    #           variables in every constraint. negative columns are variables that do not exist and are skipped
+    #         sense (str) '<=', '>=' or '=='
+    #         rhs (float or np.array of float) right hand side. broadcasts to shape
+    def add_constrs(self, name, shape, terms, sense, rhs):
+        assert name not in self.blocks, 'constraint family ' + name + ' already exists'
+        num_rows = int(np.prod(shape))
+        if num_rows == 0:
+            self.blocks[name] = (sp.csr_matrix((0, self.num_vars)), sense, np.zeros(0))
+            return
+        rows, cols, vals = [], [], []
+        for t_cols, t_coefs in terms:
+            t_cols, t_coefs = np.asarray(t_cols), np.asarray(t_coefs, dtype = float)
+            bshape = np.broadcast(t_cols, t_coefs).shape
+            target = tuple(shape) + tuple(bshape[len(shape):])
+            t_cols = np.broadcast_to(t_cols, target).reshape(num_rows, -1)
+            t_coefs = np.broadcast_to(t_coefs, target).reshape(num_rows, -1)
+            rows.append(np.repeat(np.arange(num_rows), t_cols.shape[1]))
+            cols.append(t_cols.ravel())
+            vals.append(t_coefs.ravel())
+        rows, cols, vals = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+        keep = (cols >= 0) & (vals != 0)
+        A = sp.coo_matrix((vals[keep], (rows[keep], cols[keep])), shape = (num_rows, self.num_vars)).tocsr()
+        A.eliminate_zeros() # coefficients of the same variable can cancel (ex. C[i] - C[j] when i == j)
+        rhs = np.broadcast_to(np.asarray(rhs, dtype = float), shape).ravel()
+        self.blocks[name] = (A, sense, rhs)
+
+    #  input: cols (np.array of int) variable columns. negative columns are skipped
+    #         coefs (float or np.array of float) objective coefficient of each variable. broadcasts to cols
+    def add_obj(self, cols, coefs):
+        cols, coefs = np.broadcast_arrays(np.asarray(cols), np.asarray(coefs, dtype = float))
+        keep = cols.ravel() >= 0  # negative columns are variables that do not exist
+        self._obj_cols.append(cols.ravel()[keep])
+        self._obj_vals.append(coefs.ravel()[keep])
+
+    def lb(self):
+        return np.repeat(np.array(self._lbs, dtype = float), self._sizes)
+
+    def ub(self):
+        return np.repeat(np.array(self._ubs, dtype = float), self._sizes)
+
+    def vtype(self):
+        return np.repeat(np.array(self._vtypes), self._sizes)
+
+    # output: c (np.array of float) [num_vars] objective coefficient of every variable
+    def obj(self):
+        if not self._obj_cols:
+            return np.zeros(self.num_vars)
+        return np.bincount(np.concatenate(self._obj_cols), weights = np.concatenate(self._obj_vals), minlength = self.num_vars)
+
+    # output: A (scipy.sparse.csr_matrix) [rows of family, num_vars] coefficients of the constraint family name
+    def matrix(self, name):
+        A = self.blocks[name][0]  # families only see the variables added before them. pad with empty columns
+        return sp.csr_matrix((A.data, A.indices, A.indptr), shape = (A.shape[0], self.num_vars))
+
+    #  input: name (str) name of an existing constraint family
+    def remove_constrs(self, name):
+        del self.blocks[name]
+
+    def num_constrs(self):
+        return sum([ A.shape[0] for A, _, _ in self.blocks.itervalues() ])
+
+
+# # # # # # # # # # # # # # # # #
+#   M O D E L   B U I L D E R   #
+# # # # # # # # # # # # # # # # #
+
+#  input: F_phasing (np.array of float) [m, l+g+2r] mixed copy number f_p,s of mutation s in sample p
+#         C_RNA (np.array of float) [2n-1, 2r] allele specific copy numbers of the scRNA clones
+#         U (np.array of float) [m, 2n-1] 0 <= u_p,k <= 1. percent of sample p made by clone k
+#         Q (np.array of 0 or 1) [l+g, r] q_b,s == 1 if breakpoint b is in segment s. 0 otherwise
+#         G (np.array of 0 or 1) [l, l] g_s,t == 1 if breakpoints s and t are mates. 0 otherwise
+#         Pi (np.array of float) [m, l+g] expected bpf (ratio of bp copy num to segment copy num)
+#         n (int) number of leaves in phylogeny. 2n-1 is total number of nodes
+#         c_max (int) maximum allowed copy number for any element in output C
+#         lamb1 (float) regularization term to weight total tree cost against unmixing error
+#         lamb2 (float) regularization term to weight breakpoint frequency error
+#         symmetry (bool) if True add constraints that keep one labelling of interchangeable nodes and scRNA clones.
+#           only used with matching 'milp'
+#         formulation (str) 'bits' encodes "copy number is nonzero" with a binary expansion of the copy number and
+#           "breakpoint appears on edge (i,j)" with a binary expansion of a helper integer. 'bigm' bounds the copy number
+#           by its indicator and writes the appearance as the logical and of its three conditions. see FORMULATIONS
+#         matching (str) 'milp' matches nodes to scRNA clones with the binary permutation M in the model. 'hungarian'
+#           leaves M out and fixes the matching to match (see set_match_constraints). see MATCHINGS
+#         match (np.array of int or None) [2n-1] scRNA clone of each node for 'hungarian'. None matches node k to clone k
+# output: mm (MatrixModel) the get_C model, same model as solver.get_C builds element by element but without the
+#           variables and constraints of edges that cannot be in the tree
+#         idx (dict) key is output variable name ('C', 'M', 'E', 'A', 'R', 'W'). val (np.array of int) their columns.
+#           E, R and W have column -1 for edges that cannot be in the tree. 'hungarian' has no 'M'
+def build_C_model(F_phasing, C_RNA, U, Q, G, Pi, n, c_max, lamb1, lamb2, symmetry = False, formulation = 'bits', matching = 'milp', match = None):
+    l_g, r = Q.shape
+    m, _ = U.shape
+    N = 2 * n - 1
+    mm = MatrixModel()
+
+    ei, ej = possible_edges(n)
+    K = len(ei)
+
+    C = mm.add_vars((N, l_g + 2*r), 0, c_max, 'I')
+    M = mm.add_vars((N, N), 0, 1, 'B') if matching == 'milp' else None
+    E = _on_edges(mm.add_vars((K,), 0, 1, 'B'), ei, ej, N)
+    A = mm.add_vars((N, N), 0, 1, 'B')  # ancestry matrix
+    R = _on_edges(mm.add_vars((K,), 0, c_max * 2*r, 'I'), ei, ej, N)  # rho. cost across each edge
+    S = mm.add_vars((m, l_g), 0, c_max, 'C')  # ess. bpf penalty for each bp in each sample
+    cols = mate_columns(G, l_g)
+    W_shared = mm.add_vars((K, cols.max() + 1), 0, 1, 'B')  # mated breakpoints share one variable
+    W = _on_edges(W_shared[:, cols], ei, ej, N)
+    D = mm.add_vars((l_g,), 0, 1, 'B')
+    if formulation == 'bigm':  # only the breakpoint and SNV columns are ever used
+        C_bin = _get_indicator(mm, 'C_bin', C[:, :l_g], c_max)
+    else:
+        C_bin = _get_bin_rep(mm, 'C_bin', C[:, :l_g], c_max)
+    Gam = mm.add_vars((N, l_g, 2), 0, c_max, 'I')
+
+    if M is not None:
+        _set_matching_constraints(mm, M)
+    _set_copy_num_constraints(mm, C, n, l_g)
+    _set_tree_constraints(mm, E, n)
+    _set_ancestry_constraints(mm, A, E, N, ei, ej)
+    _set_cost_constraints(mm, R, C, E, ei, ej, l_g, r, c_max)
+    _set_bp_gain_and_loss_constraints(mm, C_bin, C, W, E, ei, ej, l_g, Gam, c_max, D, formulation)
+    _set_segment_copy_num_constraints(mm, Gam, C, Q, W, n, l_g, r, D, c_max)
+    f_abs, c_abs = _set_objective(mm, F_phasing, M, C, C_RNA, R, S, lamb1, lamb2, l_g)
+
+    idx = { 'C': C, 'E': E, 'A': A, 'R': R, 'W': W, 'S': S, 'Gam': Gam, 'f_abs': f_abs, 'c_abs': c_abs }
+    if M is not None:
+        _set_rna_symmetry_constraints(mm, M, C_RNA, symmetry)
+        idx['M'] = M
+    else:
+        set_match_constraints(mm, idx, C_RNA, np.arange(N) if match is None else match)
+    set_U_constraints(mm, idx, F_phasing, Pi, U, symmetry)
+    return mm, idx
+
+
+#  input: n (int) number of leaves in phylogeny. 2n-1 is total number of nodes
+# output: ei, ej (np.array of int) [K] edges (ei[k], ej[k]) that can be in the tree. edges leave the root or an
+#           internal node, never enter the root and are never self edges
+def possible_edges(n):
+    N = 2 * n - 1
+    ei, ej = [ x.ravel() for x in np.meshgrid(np.arange(n, N), np.arange(0, N - 1), indexing = 'ij') ]
+    keep = ei != ej
+    return ei[keep], ej[keep]
+
+
+#  input: G (np.array of 0 or 1) [l, l] g_s,t == 1 if breakpoints s and t are mates. 0 otherwise
+# output: pairs (list of tuple of int) (s, t) with s < t for every pair of mated breakpoints
+def mate_pairs(G):
+    return [ (s, t) for s, t in zip(*np.nonzero(G)) if s < t ]
+
+
+#  input: G see mate_pairs. l_g (int) number of breakpoints and SNVs
+# output: cols (np.array of int) [l_g] column of the shared W variable of each breakpoint and SNV. breakpoints
+#           connected through mates (a breakpoint can have more than one) have the same column, all others are
+#           distinct, and they number 0 to cols.max()
+def mate_columns(G, l_g):
+    rep = np.arange(l_g)
+    def find(s):  # union-find representative of s, with path compression
+        root = s
+        while rep[root] != root:
+            root = rep[root]
+        while rep[s] != root:
+            rep[s], s = root, rep[s]
+        return root
+    for s, t in mate_pairs(G):
+        rep[find(t)] = find(s)
+    _, cols = np.unique([ find(s) for s in xrange(0, l_g) ], return_inverse = True)
+    return cols
+
+
+#  input: cols (np.array of int) [K, ...] columns of variables of every possible edge
+# output: X (np.array of int) [N, N, ...] cols scattered to the edges. -1 for edges that cannot be in the tree
+def _on_edges(cols, ei, ej, N):
+    X = -np.ones((N, N) + cols.shape[1:], dtype = int)
+    X[ei, ej] = cols
+    return X
+
+
+#  input: mm, idx (MatrixModel, dict) get_C model and the columns of its variables from build_C_model
+#         C_RNA, Q, n, c_max see build_C_model
+# output: x (np.array of float) [mm.num_vars] partial MIP start from the scRNA clones. node k is matched (M) to scRNA
+#           clone rows[k] and gets its copy numbers of the segments without breakpoints or SNVs (the root keeps one copy
+#           of each allele). E and A are the tree of rna_tree. nan for all other variables, which the solver completes.
+#  notes: copy numbers of segments with breakpoints or SNVs are left to the solver. they can only change on an edge
+#         together with the copy numbers of their mutations, which the scRNA clones say nothing about
+def rna_start(mm, idx, C_RNA, Q, n, c_max):
+    N = 2 * n - 1
+    P = C_RNA[:N]
+    rows, parent = rna_tree(P, n)
+    x = np.full(mm.num_vars, np.nan)
+    C_seg = np.clip(np.rint(P[rows]), 0, c_max)
+    C_seg[N - 1] = 1.0
+    free = np.tile(np.sum(Q, axis = 0) == 0, 2)  # both alleles of every segment
+    l_g = Q.shape[0]
+    x[idx['C'][:, l_g:l_g + P.shape[1]][:, free]] = C_seg[:, free]
+    if 'M' in idx:
+        x[idx['M']] = np.eye(N)[rows]
+    E, A = np.zeros((N, N)), np.zeros((N, N))
+    E[parent[:N - 1], np.arange(N - 1)] = 1.0
+    for j in xrange(0, N - 1):
+        i = j
+        while i != N - 1:
+            i = parent[i]
+            A[i, j] = 1.0
+    on = idx['E'] >= 0
+    x[idx['E'][on]] = E[on]
+    x[idx['A']] = A
+    return x
+
+
+#  input: P (np.array of float) [2n-1, 2r] copy number profiles of the scRNA clones
+# output: rows (np.array of int) [2n-1] scRNA clone of each node. the clone closest to one copy of each allele is the
+#           root, the n clones farthest from it are the leaves
+#         parent (np.array of int) [2n-1] parent of each node (the root is its own parent). the two closest subtrees
+#           are joined first, and each join takes the unused clone closest to the mean of their profiles
+def rna_tree(P, n):
+    N = 2 * n - 1
+    dist = lambda X, y: np.abs(X - y).sum(axis = -1)
+    root = int(np.argmin(dist(P, 1.0)))
+    rest = np.array([ c for c in xrange(0, N) if c != root ], dtype = int)
+    rest = rest[np.argsort(-dist(P[rest], P[root]), kind = 'mergesort')]
+    rows, parent = np.zeros(N, dtype = int), np.zeros(N, dtype = int)
+    rows[:n], rows[N - 1], parent[N - 1] = rest[:n], root, N - 1
+    inner = list(rest[n:])
+    subtrees = dict([ (k, P[rows[k]]) for k in xrange(0, n) ])  # node at the top of each subtree and its profile
+    for v in xrange(n, N):
+        keys = sorted(subtrees.keys())
+        a, b = min([ (a, b) for a in keys for b in keys if a < b ], key = lambda ab: dist(subtrees[ab[0]], subtrees[ab[1]]))
+        if v < N - 1:
+            mid = (subtrees[a] + subtrees[b]) / 2.0
+            rows[v] = inner.pop(int(np.argmin([ dist(P[c], mid) for c in inner ])))
+        parent[a], parent[b] = v, v
+        del subtrees[a], subtrees[b]
+        subtrees[v] = P[rows[v]]
+    return rows, parent
+
+
+# names of the constraint families whose coefficients depend on U. all other families only depend on the input
+U_CONSTRS = [ 'bpf_pos', 'bpf_neg', 'fhat_pos', 'fhat_neg', 'sym_inner', 'sym_leaf' ]
+
+#  input: mm (MatrixModel) get_C model from build_C_model. U_CONSTRS must not be in it yet
+#         idx (dict) columns of the variables of mm from build_C_model
+#         F_phasing, Pi, U, symmetry see build_C_model
+def set_U_constraints(mm, idx, F_phasing, Pi, U, symmetry = False):
+    _set_bpf_penalty(mm, idx['S'], Pi, U, idx['C'], idx['Gam'])
+    _set_fhat_constraints(mm, idx['f_abs'], F_phasing, U, idx['C'])
+    # with the matching fixed ('hungarian', no M) every node has its own scRNA clone, so nodes are not interchangeable
+    _set_node_symmetry_constraints(mm, idx['E'], idx['A'], U, symmetry and 'M' in idx)
+
+
+# names of the constraint families whose coefficients depend on the matching of nodes to scRNA clones when it is fixed
+#   outside the model ('hungarian')
+MATCH_CONSTRS = [ 'rna_pos', 'rna_neg' ]
+
+#  input: mm (MatrixModel) get_C model from build_C_model with matching 'hungarian'. MATCH_CONSTRS must not be in it yet
+#         idx (dict) columns of the variables of mm from build_C_model
+#         C_RNA see build_C_model
+#         match (np.array of int) [2n-1] scRNA clone of each node
+def set_match_constraints(mm, idx, C_RNA, match):
+    C, c_abs = idx['C'], idx['c_abs']
+    N, r2 = c_abs.shape
+    l_g = idx['S'].shape[1]
+    C_seg = C[:, l_g:l_g + r2]  # same columns as the 'milp' matching in _set_objective
+    P = C_RNA[match]
+    mm.add_constrs('rna_pos', (N, r2), [(c_abs, 1.0), (C_seg, -1.0)], '>=', -P)
+    mm.add_constrs('rna_neg', (N, r2), [(c_abs, 1.0), (C_seg, 1.0)], '>=', P)
+
+
+#  input: F_phasing (np.array of float) [m, l+g+2r] mixed copy number f_p,s of mutation s in sample p
+#         C (np.array of int) [2n-1, l+g+2r] int copy number c_k,s of mutation s in clone k
+#         n (int) number of leaves in phylogeny. 2n-1 is total number of nodes
+#         only_leaf (bool) if True internal nodes have zero frequencies
+# output: mm (MatrixModel) the get_U LP. minimizes sum_p,s |F[p, s] - sum_k U[p, k] * C[k, s]| with every row of U
+#           on the simplex
+#         U (np.array of int) [m, 2n-1] columns of U
+def build_U_model(F_phasing, C, n, only_leaf = False):
+    m, L = F_phasing.shape
+    N = 2 * n - 1
+    mm = MatrixModel()
+    U = mm.add_vars((m, N), 0, 1)
+    T = mm.add_vars((m, L))  # |F - UC| for each sample and mutation
+    mm.add_constrs('u_sum', (m,), [(U, 1.0)], '==', 1.0)  # frequencies sum to 1
+    if only_leaf:
+        mm.add_constrs('u_leaf', (m,), [(U[:, n:N - 1], 1.0)], '==', 0.0)  # internal nodes have zero frequencies
+    U_b, C_t = U[:, np.newaxis, :], C.T[np.newaxis, :, :]
+    mm.add_constrs('u_pos', (m, L), [(T, 1.0), (U_b, C_t)], '>=', F_phasing)
+    mm.add_constrs('u_neg', (m, L), [(T, 1.0), (U_b, -C_t)], '>=', -F_phasing)
+    mm.add_obj(T, 1.0)
+    return mm, U
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#   V E C T O R I Z E D   C O N S T R A I N T S         #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+def _set_matching_constraints(mm, M):
+    N = M.shape[0]
+    mm.add_constrs('match_row', (N,), [(M, 1.0)], '==', 1.0)
+    mm.add_constrs('match_col', (N,), [(M.T, 1.0)], '==', 1.0)
+
+
+def _set_copy_num_constraints(mm, C, n, l_g):
+    mm.add_constrs('root_bp_cn', (l_g,), [(C[2*n - 2, :l_g], 1.0)], '==', 0.0)  # bp has copy number 0 at root
+    mm.add_constrs('root_seg_cn', (C.shape[1] - l_g,), [(C[2*n - 2, l_g:], 1.0)], '==', 1.0)  # each allele has 1 copy at root
+
+
+#  notes: only possible edges have variables (see possible_edges), so leaves have no outgoing edges, the root has no
+#         incoming edge and there are no self edges by construction
+def _set_tree_constraints(mm, E, n):
+    N = 2 * n - 1
+    mm.add_constrs('out_degree', (N - n,), [(E[n:, :], 1.0)], '==', 2.0)  # internal nodes have 2 outgoing edges
+    mm.add_constrs('in_degree', (N - 1,), [(E[n:, :N - 1].T, 1.0)], '==', 1.0)  # non root nodes have 1 incoming edge
+    i, j = np.triu_indices(N - 1 - n, 1)
+    i, j = i + n, j + n
+    mm.add_constrs('two_cycle', (len(i),), [(E[i, j], 1.0), (E[j, i], 1.0)], '<=', 1.0)  # no 2 node cycles
+
+
+def _set_ancestry_constraints(mm, A, E, N, ei, ej):
+    nodes = np.arange(0, N)
+    mm.add_constrs('root_anc', (N - 1,), [(A[N - 1, :N - 1], 1.0)], '==', 1.0)  # root is ancestor to all nodes
+    mm.add_constrs('root_no_anc', (N,), [(A[:, N - 1], 1.0)], '==', 0.0)  # root has no ancestors
+    mm.add_constrs('anc_parent', (len(ei),), [(A[ei, ej], 1.0), (E[ei, ej], -1.0)], '>=', 0.0)  # ancestor if parent
+    k, g = [ x.ravel() for x in np.meshgrid(np.arange(len(ei)), nodes, indexing = 'ij') ]
+    k, g = k[g != ei[k]], g[g != ei[k]]  # v_j gets v_i's ancestor profile except a_{i,j}. trivial if (i,j) is not an edge
+    i, j = ei[k], ej[k]
+    mm.add_constrs('anc_inherit_lb', (len(k),), [(A[g, j], 1.0), (E[i, j], -1.0), (A[g, i], -1.0)], '>=', -1.0)
+    mm.add_constrs('anc_inherit_ub', (len(k),), [(A[g, j], 1.0), (E[i, j], 1.0), (A[g, i], -1.0)], '<=', 1.0)
+    mm.add_constrs('anc_antisym', (N, N), [(A, 1.0), (A.T, 1.0)], '<=', 1.0)
+    mm.add_constrs('anc_irreflexive', (N,), [(A[nodes, nodes], 1.0)], '==', 0.0)
+
+
+def _set_cost_constraints(mm, R, C, E, ei, ej, l_g, r, c_max):
+    K = len(ei)
+    E_b = E[ei, ej][:, np.newaxis]
+    Xs = []
+    for allele, bgn in [ ('maj', l_g), ('min', l_g + r) ]:  # cost is difference between copy number of each allele
+        X = mm.add_vars((K, r), 0, c_max, 'I')
+        C_i, C_j = C[ei, bgn:bgn + r], C[ej, bgn:bgn + r]
+        mm.add_constrs('cost_edge_' + allele, (K, r), [(X, 1.0), (E_b, -c_max)], '<=', 0.0)  # no cost if no edge exists
+        mm.add_constrs('cost_up_' + allele, (K, r), [(X, 1.0), (C_i, -1.0), (C_j, 1.0), (E_b, -(c_max + 1))], '>=', -(c_max + 1))
+        mm.add_constrs('cost_dn_' + allele, (K, r), [(X, 1.0), (C_i, 1.0), (C_j, -1.0), (E_b, -(c_max + 1))], '>=', -(c_max + 1))
+        Xs.append(X)
+    mm.add_constrs('cost_sum', (K,), [(R[ei, ej], 1.0), (Xs[0], -1.0), (Xs[1], -1.0)], '==', 0.0)
+
+
+def _set_bp_gain_and_loss_constraints(mm, C_bin, C, W, E, ei, ej, l_g, Gam, c_max, D, formulation):
+    K = len(ei)
+    shape = (K, l_g)
+    E_b, D_b, W_e = E[ei, ej][:, np.newaxis], D[np.newaxis, :], W[ei, ej]
+    if formulation == 'bigm':  # W == 1 iff C_bin[i] == 0 and C_bin[j] == 1 and E[i,j] == 1
+        mm.add_constrs('bp_absent_i', shape, [(W_e, 1.0), (C_bin[ei], 1.0)], '<=', 1.0)
+        mm.add_constrs('bp_present_j', shape, [(W_e, 1.0), (C_bin[ej], -1.0)], '<=', 0.0)
+        mm.add_constrs('bp_on_edge', shape, [(W_e, 1.0), (E_b, -1.0)], '<=', 0.0)
+        mm.add_constrs('bp_appear', shape, [(W_e, 1.0), (C_bin[ei], 1.0), (C_bin[ej], -1.0), (E_b, -1.0)], '>=', -1.0)
+    else:
+        X = mm.add_vars(shape, 0, 3, 'I')  # only 0 if copy num goes from 0 to 1 across edge (i,j)
+        mm.add_constrs('bp_gain', shape, [(X, 1.0), (C_bin[ei], -1.0), (C_bin[ej], 1.0), (E_b, 1.0)], '==', 2.0)
+        X_bin = _get_bin_rep(mm, 'X_bin', X, 3)
+        mm.add_constrs('bp_appear', shape, [(W_e, 1.0), (X_bin, 1.0)], '==', 1.0)  # set W as bp appearance
+    # breakpoint pairs appear on same edge. mates share one W variable (see mate_columns) so this needs no constraints
+    mm.add_constrs('bp_once', (l_g,), [(W_e.T, 1.0)], '==', 1.0)  # breakpoints only appear once in the tree
+
+    # only set constraints to the breakpoints that are not appeared in this branch
+    G_i, G_j = Gam[ei], Gam[ej]
+    C_i, C_j = C[ei, :l_g], C[ej, :l_g]
+    lo, hi = 2 * c_max + 1, 2 * c_max + 2
+    diff = [(C_j, -1.0), (C_i, 1.0)]
+    mm.add_constrs('gam_maj_lb', shape, [(G_j[..., 0], 1.0), (G_i[..., 0], -1.0), (E_b, -lo), (D_b, -lo), (W_e, lo)] + diff, '>=', -2 * lo)
+    mm.add_constrs('gam_maj_ub', shape, [(G_j[..., 0], 1.0), (G_i[..., 0], -1.0), (E_b, hi), (D_b, hi), (W_e, -hi)] + diff, '<=', 2 * hi)
+    mm.add_constrs('gam_min_lb', shape, [(G_j[..., 1], 1.0), (G_i[..., 1], -1.0), (E_b, -lo), (D_b, lo), (W_e, lo)] + diff, '>=', -lo)
+    mm.add_constrs('gam_min_ub', shape, [(G_j[..., 1], 1.0), (G_i[..., 1], -1.0), (E_b, hi), (D_b, -hi), (W_e, -hi)] + diff, '<=', hi)
+
+
+def _set_segment_copy_num_constraints(mm, Gam, C, Q, W, n, l_g, r, D, c_max):
+    N = 2 * n - 1
+    shape = (N, l_g)
+    Q_b = Q[np.newaxis, :, :]
+    W_j = W.transpose(1, 2, 0)  # [j, b, i]
+    mm.add_constrs('seg_cn_maj', shape, [(Gam[:, :, 0], 1.0), (C[:, np.newaxis, l_g:l_g + r], -Q_b)], '==', 0.0)  # define copy num of segment containing breakpoint
+    mm.add_constrs('seg_cn_min', shape, [(Gam[:, :, 1], 1.0), (C[:, np.newaxis, l_g + r:l_g + 2*r], -Q_b)], '==', 0.0)
+    mm.add_constrs('bp_le_seg_maj', shape, [(C[:, :l_g], 1.0), (Gam[:, :, 0], -1.0), (D, c_max)], '<=', c_max)  # cp num breakpoint cant exceed cp num of seg containing bp
+    mm.add_constrs('bp_le_seg_min', shape, [(C[:, :l_g], 1.0), (Gam[:, :, 1], -1.0), (D, -c_max)], '<=', 0.0)
+    mm.add_constrs('seg_present_maj', shape, [(Gam[:, :, 0], 1.0), (D, -1.0), (W_j, -1.0)], '>=', -1.0)  # segment must exist if bp appears at node j
+    mm.add_constrs('seg_present_min', shape, [(Gam[:, :, 1], 1.0), (D, 1.0), (W_j, -1.0)], '>=', 0.0)
+
+
+#  S[p, b] >= |Pi[p, b] * sg_cpnum_est - bp_cpnum_est|. depends on U
+def _set_bpf_penalty(mm, S, Pi, U, C, Gam):
+    m, l_g = S.shape
+    shape = (m, l_g)
+    coef_sg = Pi[:, :, np.newaxis] * U[:, np.newaxis, :]  # [p, b, k]
+    coef_bp = U[:, np.newaxis, :]
+    G_0, G_1, C_b = Gam[:, :, 0].T[np.newaxis], Gam[:, :, 1].T[np.newaxis], C[:, :l_g].T[np.newaxis]  # [1, b, k]
+    mm.add_constrs('bpf_pos', shape, [(S, 1.0), (G_0, -coef_sg), (G_1, -coef_sg), (C_b, coef_bp)], '>=', 0.0)
+    mm.add_constrs('bpf_neg', shape, [(S, 1.0), (G_0, coef_sg), (G_1, coef_sg), (C_b, -coef_bp)], '>=', 0.0)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # #
+#   S Y M M E T R Y   B R E A K I N G         #
+# # # # # # # # # # # # # # # # # # # # # # # #
+
+# with U fixed, two leaves (or two internal nodes) with identical columns of U can swap labels without changing the
+#   objective, so every tree is found once per labelling. keep one labelling: within each group of interchangeable
+#   internal nodes a node is never the ancestor of a higher numbered node, and interchangeable leaves are sorted by
+#   the index of their parent. depends on U
+def _set_node_symmetry_constraints(mm, E, A, U, symmetry):
+    N = U.shape[1]
+    n = (N + 1) // 2
+    inner, leaf = [], []
+    if symmetry:
+        for grp in _identical_groups(np.transpose(U[:, n:N - 1])):
+            inner += [ (i, j) for a, i in enumerate(grp + n) for j in grp[a + 1:] + n ]
+        for grp in _identical_groups(np.transpose(U[:, :n])):
+            leaf += zip(grp[:-1], grp[1:])
+    inner, leaf = np.array(inner, dtype = int).reshape((-1, 2)), np.array(leaf, dtype = int).reshape((-1, 2))
+    mm.add_constrs('sym_inner', (len(inner),), [(A[inner[:, 0], inner[:, 1]], 1.0)], '==', 0.0)
+    parent_idx = np.arange(N, dtype = float)  # sum_k k * E[k, j] is the index of the parent of j
+    mm.add_constrs('sym_leaf', (len(leaf),), [(E[:, leaf[:, 0]].T, parent_idx), (E[:, leaf[:, 1]].T, -parent_idx)], '<=', 0.0)
+
+
+# scRNA clones with identical copy numbers can swap their matched nodes without changing the objective. keep the
+#   matching where the node matched to the lower numbered clone has the lower index
+def _set_rna_symmetry_constraints(mm, M, C_RNA, symmetry):
+    N = M.shape[0]
+    pairs = []
+    if symmetry:
+        for grp in _identical_groups(C_RNA[:N]):
+            pairs += zip(grp[:-1], grp[1:])
+    pairs = np.array(pairs, dtype = int).reshape((-1, 2))
+    node_idx = np.arange(N, dtype = float)
+    mm.add_constrs('sym_rna', (len(pairs),), [(M[:, pairs[:, 0]].T, node_idx), (M[:, pairs[:, 1]].T, -node_idx)], '<=', 0.0)
+
+
+#  input: X (np.array) [k, d]
+# output: groups (list of np.array of int) indices of the rows of X that are identical, for every group of at least 2 rows
+def _identical_groups(X):
+    if len(X) == 0:
+        return []
+    _, inv = np.unique(X, axis = 0, return_inverse = True)
+    inv = np.asarray(inv).ravel()
+    return [ np.where(inv == v)[0] for v in np.unique(inv) if np.sum(inv == v) > 1 ]
+
+
+# # # # # # # # #
+#   OBJECTIVE   #
+# # # # # # # # #
+
+# output: f_abs (np.array of int) [m, l+g+2r] columns of |F - UC|. constrained by _set_fhat_constraints
+#         c_abs (np.array of int) [2n-1, 2r] columns of |C - MC_RNA| over the segments. constrained here if M is given
+#           and by set_match_constraints otherwise
+def _set_objective(mm, F_phasing, M, C, C_RNA, R, S, lamb1, lamb2, l_g):
+    m, L = F_phasing.shape
+    N, _ = C.shape
+    r2 = C_RNA.shape[1]
+    f_abs = mm.add_vars((m, L))  # |F - UC| for each sample and mutation
+
+    # nb: scRNA matching objective sum
+    c_abs = mm.add_vars((N, r2))
+    if M is not None:
+        M_b, C_RNA_t = M[:, np.newaxis, :], C_RNA[:N].T[np.newaxis, :, :]
+        mm.add_constrs('rna_pos', (N, r2), [(c_abs, 1.0), (C[:, l_g:l_g + r2], -1.0), (M_b, C_RNA_t)], '>=', 0.0)
+        mm.add_constrs('rna_neg', (N, r2), [(c_abs, 1.0), (C[:, l_g:l_g + r2], 1.0), (M_b, -C_RNA_t)], '>=', 0.0)
+
+    mm.add_obj(f_abs, 1.0)
+    mm.add_obj(R, lamb1)
+    mm.add_obj(S, lamb2)
+    mm.add_obj(c_abs, 1.0)
+    return f_abs, c_abs
+
+
+#  f_abs[p, s] >= |F[p, s] - f_hat[p, s]| where f_hat = UC. depends on U
+def _set_fhat_constraints(mm, f_abs, F_phasing, U, C):
+    m, L = F_phasing.shape
+    U_b, C_t = U[:, np.newaxis, :], C.T[np.newaxis, :, :]
+    mm.add_constrs('fhat_pos', (m, L), [(f_abs, 1.0), (C_t, U_b)], '>=', F_phasing)
+    mm.add_constrs('fhat_neg', (m, L), [(f_abs, 1.0), (C_t, -U_b)], '>=', -F_phasing)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#   V E C T O R I Z E D   V A R I A B L E   M A K E R S #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+#  input: X (np.array of int) columns of integer variables with 0 <= x <= vmax
+# output: Y (np.array of int) [X.shape] columns of binary variables. y == 0 if x == 0. y == 1 if x != 0
+def _get_bin_rep(mm, name, X, vmax):
+    shape = X.shape
+    num_bits = int(math.floor(math.log(vmax, 2))) + 1  # maximum number of bits required
+    Y = mm.add_vars(shape, 0, 1, 'B')
+    Z = mm.add_vars(shape + (num_bits,), 0, 1, 'B')  # bit representation of X
+    mm.add_constrs(name + '_bits', shape, [(Z, 2.0 ** np.arange(num_bits)), (X, -1.0)], '==', 0.0)
+    mm.add_constrs(name + '_any', shape + (num_bits,), [(Z, 1.0), (Y[..., np.newaxis], -1.0)], '<=', 0.0)  # Y must be 1 if any bits are 1
+    mm.add_constrs(name + '_none', shape, [(Y, 1.0), (Z, -1.0)], '<=', 0.0)  # Y must be 0 if all bits are 0
+    return Y
+
+
+#  input: X (np.array of int) columns of integer variables with 0 <= x <= vmax
+# output: Y (np.array of int) [X.shape] columns of binary variables with y <= x <= vmax * y. y == 1 iff x != 0
+def _get_indicator(mm, name, X, vmax):
+    Y = mm.add_vars(X.shape, 0, 1, 'B')
+    mm.add_constrs(name + '_lb', X.shape, [(Y, 1.0), (X, -1.0)], '<=', 0.0)
+    mm.add_constrs(name + '_ub', X.shape, [(X, 1.0), (Y, -vmax)], '<=', 0.0)
+    return Y
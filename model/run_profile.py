@@ -0,0 +1,120 @@
+#     file: run_profile.py
+#  purpose: Where the time and memory of a run go. unmix times named stages of the pipeline (parsing the .vcf files,
+#           coordinate descent, post processing and writing the output) and records the sizes of the input arrays.
+#           the get_C and get_U calls run in the worker processes, so their build and solve times are summed from the
+#           telemetry file. everything is written to run_profile.json in the output directory. with a cProfile
+#           directory every stage is also profiled and its stats dumped there, for pstats or snakeviz
+
+
+# # # # # # # # # # #
+#   I M P O R T S   #
+# # # # # # # # # # #
+
+import os
+import sys
+import json
+import time
+import cProfile
+import resource
+import tempfile
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# # # # # # # # # # # # #
+#   C O N S T A N T S   #
+# # # # # # # # # # # # #
+
+PROFILE_FNAME = 'run_profile.json'
+CPROFILE_DIR = 'cprofile'   # subdirectory of the output directory
+RSS_UNIT_MB = 1.0 / 1024 ** 2 if sys.platform == 'darwin' else 1.0 / 1024  # ru_maxrss is bytes on mac and KB on linux
+
+
+# # # # # # # # # # # # # # # # # # # # # #
+#   R U N   P R O F I L E   C L A S S     #
+# # # # # # # # # # # # # # # # # # # # # #
+
+class RunProfile:
+
+    #  input: fname (str or None) .json file written by write. None keeps the profile in memory only
+    #         cprofile_dir (str or None) directory of the cProfile dumps. None does not profile
+    def __init__(self, fname, cprofile_dir = None):
+        self.fname, self.cprofile_dir = fname, cprofile_dir
+        self.start = time.time()
+        self.stages = OrderedDict()  # key is stage name. val is dict of seconds, calls and peak_rss_mb
+        self.sizes = OrderedDict()   # key is array name. val is dict of shape and mb
+        self._profiling = False
+        if cprofile_dir is not None and not os.path.isdir(cprofile_dir):
+            os.mkdir(cprofile_dir)
+
+    #  input: name (str) stage timed by the body of the with statement. repeated stages add up
+    #  notes: only the outermost stage is profiled, since one cProfile profiler can run at a time. its dump includes
+    #         the stages nested in it. call k of a stage is dumped to <cprofile_dir>/<name>.<k>.prof
+    @contextmanager
+    def stage(self, name):
+        rec = self.stages.setdefault(name, { 'seconds': 0.0, 'calls': 0, 'peak_rss_mb': 0.0 })
+        prof = None
+        if self.cprofile_dir is not None and not self._profiling:
+            prof, self._profiling = cProfile.Profile(), True
+            prof.enable()
+        t = time.time()
+        try:
+            yield
+        finally:
+            rec['seconds'] += time.time() - t
+            rec['calls'] += 1
+            rec['peak_rss_mb'] = peak_rss_mb()
+            if prof is not None:
+                prof.disable()
+                self._profiling = False
+                prof.dump_stats(os.path.join(self.cprofile_dir, '%s.%d.prof' % (name, rec['calls'])))
+
+    #  input: arrays (dict) key is name. val (np.array) array whose shape and size are recorded
+    def add_sizes(self, **arrays):
+        for name, X in sorted(arrays.items()):
+            self.sizes[name] = { 'shape': [ int(d) for d in X.shape ], 'mb': X.nbytes / 1024.0 ** 2 }
+
+    #  input: telemetry_fname (str or None) .jsonl file of the run's telemetry.Telemetry. its get_C and get_U records
+    #           are summed into the solver section
+    def write(self, telemetry_fname = None):
+        if self.fname is None:
+            return
+        profile = OrderedDict([ ('total_seconds', time.time() - self.start), ('stages', self.stages),
+                                ('solver', _sum_solver_records(telemetry_fname)), ('sizes', self.sizes),
+                                ('peak_rss_mb', OrderedDict([ ('main', peak_rss_mb()), ('workers', peak_rss_mb(resource.RUSAGE_CHILDREN)) ])) ])
+        fd, tmp_fname = tempfile.mkstemp(prefix = '.partial_', dir = os.path.dirname(os.path.abspath(self.fname)))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(profile, f, indent = 2)
+        os.rename(tmp_fname, self.fname)
+
+
+# # # # # # # # # # # # #
+#   F U N C T I O N S   #
+# # # # # # # # # # # # #
+
+#  input: who (int) resource.RUSAGE_SELF or resource.RUSAGE_CHILDREN (the largest of the finished worker processes)
+# output: mb (float) peak resident set size so far
+def peak_rss_mb(who = resource.RUSAGE_SELF):
+    return resource.getrusage(who).ru_maxrss * RSS_UNIT_MB
+
+
+# output: solver (dict) number of get_C and get_U calls, their summed build and solve seconds and the largest get_C model
+def _sum_solver_records(fname):
+    solver = OrderedDict([ ('get_C_calls', 0), ('get_C_build_seconds', 0.0), ('get_C_solve_seconds', 0.0), ('get_U_calls', 0),
+                           ('get_U_seconds', 0.0), ('max_num_vars', 0), ('max_num_constrs', 0) ])
+    if fname is None or not os.path.isfile(fname):
+        return solver
+    with open(fname) as f:
+        for line in f:
+            rec = json.loads(line)
+            if rec['event'] == 'get_C':
+                solver['get_C_calls'] += 1
+                solver['get_C_build_seconds'] += rec.get('build_time') or 0.0
+                solver['get_C_solve_seconds'] += rec.get('solve_time') or 0.0
+                solver['max_num_vars'] = max(solver['max_num_vars'], rec.get('num_vars') or 0)
+                solver['max_num_constrs'] = max(solver['max_num_constrs'], rec.get('num_constrs') or 0)
+            elif rec['event'] == 'get_U':
+                solver['get_U_calls'] += 1
+                solver['get_U_seconds'] += rec.get('solve_time') or 0.0
+    return solver
@@ -10,8 +10,21 @@ import sys
 import os  
 import argparse  
 import math  
+import re
+import time
 import numpy as np
-import gurobipy as gp
+import scipy
+import scipy.sparse as sp
+import scipy.optimize as opt
+import matrix_builder as mb
+import backends as bk
+import checkpoint as ck
+import init_u as iu
+
+try:
+    import gurobipy as gp
+except ImportError:  # only the open source backends and the matrix builder are available
+    gp = None
 
 # # # # # # # # # # # # #
 #   C O N S T A N T S   #
@@ -19,6 +32,19 @@ import gurobipy as gp
 
 U_MIN = 0.0
 MAX_SOLVER_ITERS = 5000
+SCIPY_VERSION = tuple(int(v) for v in re.findall(r'\d+', scipy.__version__)[:2])
+# linprog has highs from scipy 1.6. older versions (the python 2.7 builds end at 1.2) have no LP method that is both fast
+#   and reliable on the get_U LP, so there the LP is solved by the get_C backend
+U_LP_HIGHS = SCIPY_VERSION >= (1, 6)
+MIN_SOLVE_SECONDS = 1.0  # get_C time limit of the first iteration when the deadline has already passed
+
+# reasons get_UCE stops the coordinate descent
+STOP_CONVERGED = 'converged'   # C did not change
+STOP_OBJ_TOL = 'obj_tol'       # objective stopped improving
+STOP_CYCLE = 'cycle'           # returned to an earlier (U, C) state
+STOP_MAX_ITERS = 'max_iters'
+STOP_DEADLINE = 'deadline'     # ran out of time
+STOP_ERROR = 'error'
 
 
 # # # # # # # # # # # # #
@@ -37,6 +63,25 @@ MAX_SOLVER_ITERS = 5000
 #         max_iters (int) maximum number of iterations to predict U then C if convergence not reached
 #         time_limit (int) maximum number of seconds the solver will run
 #         only_leaf (boolean) the flag indicating the if the model assumes that samples are unmixed by only leaf node clones, default is False.
+#         seed (int or None) seed for the random initialization of U. None reseeds from system entropy
+#         c_solver (CSolver or None) persistent get_C model for this input, reused across calls. a new one is built if None.
+#           it is reset, so only the solves of this call warm start each other
+#         telemetry (telemetry.Telemetry or None) if given, every get_U and get_C call is recorded to it
+#         restart (int) index of this random restart. only used in telemetry
+#         obj_tol (float or None) stop once the relative objective improvement of stall_iters consecutive iterations is
+#           below obj_tol. None only stops on the criteria below
+#         stall_iters (int) number of consecutive iterations below obj_tol before stopping
+#         detect_cycles (bool) stop when a (U, C) state of an earlier iteration comes back
+#         deadline (float or None) time.time() by which coordinate descent stops. each get_C solve is limited to the
+#           time left (and to time_limit). the first iteration always runs so there is a solution to return. a later
+#           get_C that runs out of time before it finds a solution stops with the solution of the iteration before
+#         checkpoint (str or None) .pkl file the state is saved to after every iteration and the output once done.
+#           if it exists, coordinate descent continues from it (or the output is returned) instead of starting over
+#         init (str) strategy of the initial U, one of iu.STRATEGIES
+#         init_noise (float) weight of a random U mixed into a data driven initial U. see iu.init_U
+#         rna_start (bool) start the first get_C from a solution built from the scRNA clones (see mb.rna_start) instead
+#           of from nothing
+#  notes: coordinate descent also stops when C does not change. the reason for stopping is recorded to telemetry
 # output: U (np.array of float) [m, 2n-1] 0 <= u_p,k <= 1. percent of sample p made by clone k
 #         C (np.array of int) [2n-1, l+g+2r] int copy number c_k,s of mutation s in clone k
 #         E (np.array of int) [2n-1, 2n-1] e_i,j == 1 iff edge (i,j) is in tree. 0 otherwise
@@ -47,85 +92,160 @@ MAX_SOLVER_ITERS = 5000
 #  notes: l (int) is number of breakpoints depicting structural variants. r (int) is number of copy number regions, 2r means we phase it for allelic copy numbers,
 #         g (int) is number of single nucleotide variants.
 
-def get_UCE(F_phasing, C_RNA, Q, G, A, H, n, c_max, lamb1, lamb2, max_iters, time_limit=None, only_leaf=False):
-    np.random.seed()  # sets seed for running on multiple processors
+def get_UCE(F_phasing, C_RNA, Q, G, A, H, n, c_max, lamb1, lamb2, max_iters, time_limit=None, only_leaf=False, seed=None, c_solver=None, telemetry=None, restart=0,
+            obj_tol=None, stall_iters=1, detect_cycles=True, deadline=None, checkpoint=None, init='random', init_noise=0.0, rna_start=False):
+    np.random.seed(seed)  # each restart draws from its own stream when running on multiple processors
     m = len(F_phasing)
     l_g_sample, r = Q.shape
     l,_ = G.shape
     g = l_g_sample - l
-    for i in xrange(0, max_iters):
+    state = ck.load(checkpoint)
+    if state is not None and state['done']:
+        return state['out']
+    if c_solver is None:
+        c_solver = CSolver(F_phasing, C_RNA, Q, G, n, c_max, lamb1, lamb2, time_limit)
+    c_solver.reset()
+    seen, num_stalls, start = set(), 0, 0
+    if state is not None:  # resume after the last iteration that finished
+        start, seen, num_stalls, c_solver.match = state['iteration'], state['seen'], state['num_stalls'], state['match']
+        solution = state['solution']
+        U, M, C, E, A, R, W, W_sv, W_snv, obj_val = solution
+        prevC, prev_obj_val = C, obj_val
+        np.random.set_state(state['rng'])
+    for i in xrange(start, max_iters):
 
         if i == 0:
-            U = gen_U(m, n)
+            U = iu.init_U(init, F_phasing, n, only_leaf, init_noise)
+        elif deadline is not None and time.time() >= deadline:
+            reason = STOP_DEADLINE
+            break
         else:
-            U = get_U(F_phasing, C, n, l, only_leaf)
-        obj_val, M, C, E, A, R, W, W_sv, W_snv, err_msg = get_C(F_phasing, C_RNA, U, Q, G, A, H, n, c_max, lamb1, lamb2, time_limit)
+            t = time.time()
+            U, err_msg = get_U(F_phasing, C, n, l, only_leaf, c_solver.backend_name)
+            if err_msg != None:
+                _write_stop(telemetry, restart, n, i + 1, STOP_ERROR, None)
+                return None, None, None, None, None, None, None, None, None, None, err_msg
+            if telemetry is not None:
+                telemetry.write('get_U', restart=restart, iteration=i, n=n, solve_time=time.time() - t, num_samples=m,
+                                obj_val=np.abs(F_phasing - U.dot(C)).sum())
+            if deadline is not None and time.time() >= deadline:  # get_U used up the time left
+                U, reason = solution[0], STOP_DEADLINE
+                break
+        solve_limit = _time_left(time_limit, deadline)
+        obj_val, M, C, E, A, R, W, W_sv, W_snv, err_msg = c_solver.solve(U, time_limit=solve_limit, rna_start=rna_start and i == 0)
+        if telemetry is not None:
+            telemetry.write('get_C', restart=restart, iteration=i, n=n, **c_solver.stats)
 
         # handle errors
+        if err_msg != None and i > 0 and solve_limit is not None:  # out of time before an incumbent. keep the last iteration
+            U, M, C, E, A, R, W, W_sv, W_snv, obj_val = solution
+            reason = STOP_DEADLINE
+            break
         if err_msg != None:
-            return None, None, None, None, None, None, err_msg
-
-        if i > 0:
-            if abs((C - prevC)).sum() == 0:
-                break
-
-        prevC = C
-
-    return U, M, C, E, A, R, W, W_sv, W_snv, obj_val, None
+            _write_stop(telemetry, restart, n, i + 1, STOP_ERROR, None)
+            return None, None, None, None, None, None, None, None, None, None, err_msg
+
+        reason = _get_stop_reason(U, C, obj_val, prevC, prev_obj_val, seen, obj_tol, detect_cycles) if i > 0 else None
+        if reason == STOP_OBJ_TOL:
+            num_stalls += 1
+            reason = STOP_OBJ_TOL if num_stalls >= stall_iters else None
+        elif reason is None:
+            num_stalls = 0
+        if reason is not None:
+            break
+        if detect_cycles:
+            seen.add(_state_key(U, C))
+
+        prevC, prev_obj_val = C, obj_val
+        solution = U, M, C, E, A, R, W, W_sv, W_snv, obj_val
+        if checkpoint is not None and i + 1 < max_iters:
+            ck.save(checkpoint, { 'done': False, 'iteration': i + 1, 'seen': seen, 'num_stalls': num_stalls, 'rng': np.random.get_state(),
+                                  'solution': solution, 'match': c_solver.match })
+    else:
+        reason = STOP_MAX_ITERS
+
+    _write_stop(telemetry, restart, n, i + 1 if reason != STOP_DEADLINE else i, reason, obj_val)
+    out = U, M, C, E, A, R, W, W_sv, W_snv, obj_val, None
+    if checkpoint is not None and reason != STOP_DEADLINE:  # a resumed run continues where the deadline stopped it
+        ck.save(checkpoint, { 'done': True, 'out': out })
+    return out
+
+
+# output: reason (str or None) why coordinate descent should stop after this iteration. None to continue.
+#           STOP_OBJ_TOL is returned for every stalled iteration. get_UCE counts them
+def _get_stop_reason(U, C, obj_val, prevC, prev_obj_val, seen, obj_tol, detect_cycles):
+    if abs((C - prevC)).sum() == 0:
+        return STOP_CONVERGED
+    if detect_cycles and _state_key(U, C) in seen:
+        return STOP_CYCLE
+    if obj_tol is not None and prev_obj_val - obj_val < obj_tol * abs(prev_obj_val):
+        return STOP_OBJ_TOL
+    return None
+
+
+# U is rounded so that the same state reached through different floating point paths has the same key
+def _state_key(U, C):
+    return (np.round(U, 8).tobytes(), np.rint(C).astype(int).tobytes())
+
+
+# output: time_limit (float or None) seconds the next get_C solve may take. None if there is no limit
+def _time_left(time_limit, deadline):
+    if deadline is None:
+        return time_limit
+    left = max(MIN_SOLVE_SECONDS, deadline - time.time())
+    return left if time_limit is None else min(time_limit, left)
+
+
+def _write_stop(telemetry, restart, n, num_iters, reason, obj_val):
+    if telemetry is not None:
+        telemetry.write('get_UCE', restart=restart, n=n, iterations=num_iters, stop_reason=reason, obj_val=obj_val)
 
 
 #  input: F (np.array of float) [m, l+g+2r] mixed copy number f_p,s of mutation s in sample p
 #         C (np.array of int) [2n-1, l+g+2r] int copy number c_k,s of mutation s in clone k
 #         n (int) number of leaves in phylogeny. 2n-1 is total number of nodes
-# output: U (np.array of float) [m, 2n-1] 0 <= u_p,k <= 1. percent of sample p made by clone k
-def get_U(F_phasing, C, n, l, only_leaf):
-    m, L = F_phasing.shape  ### xf: L=l(+g)+2r depending on if SNVs are included
-    N = 2 * n - 1
-    
-    mod = gp.Model('tusv')
-    U = _get_gp_arr_cnt_var(mod, m, N, 1.0)
-    for i in xrange(0, m):
-        mod.addConstr(gp.quicksum(U[i, :]) == 1.0, "Frequencies sum equals to 1")
-        if only_leaf:
-            mod.addConstr(gp.quicksum(U[i, n: -1]) == 0.0, "Internal nodes have zero frequencies")
-    sums = []
-    
-    for p in xrange(0, m):
-        for s in xrange(0, L):
-            f_hat = gp.quicksum([U[p, k] * C[k, s] for k in xrange(0, N)])  ### xf: Now U remains m*N, C becomes N*(l(+g)+2r), F is m*(l(+g)+2r)
-           
-            sums.append(_get_abs(mod, F_phasing[p, s] - f_hat))
-            #sums.append(F_phasing[p, s] * f_hat)
-    mod.setObjective(gp.quicksum(sums), gp.GRB.MINIMIZE)
-    #mod.setObjective(gp.quicksum(sums), gp.GRB.MAXIMIZE)
-    
-    '''
-    
-    mean_F = gp.quicksum(F_phasing[p, s] for p in xrange(0, m) for s in xrange(0, L)) / (m * L)
-    mean_UC = gp.quicksum(U[p, k] * C[k, s] for p in xrange(0, m) for k in xrange(0, N) for s in xrange(0, L)) / (m * L)
-
-    sums = []
-    for p in xrange(0, m):
-        for s in xrange(0, L):
-            f_hat = gp.quicksum([U[p, k] * C[k, s] for k in xrange(0, N)])  # UC[p, s]
-            sums.append((F_phasing[p, s] - mean_F) * (f_hat - mean_UC))
-    reg_term = gp.quicksum(U[p, k] * U[p, k] for p in xrange(0, m) for k in xrange(0, N))
-    mod.setObjective(gp.quicksum(sums) - 0.25 * reg_term, gp.GRB.MAXIMIZE)
-    '''
-    mod.optimize()
-    U = _as_solved(U)
-
-    for i in xrange(m):
-        for j in xrange(2 * n - 1):
-            if U[i, j] <= U_MIN:
-                U[i, j] = 0.0
+#         backend (str) LP solver when scipy has no highs, one of bk.BACKENDS
+# output: U (np.array of float) [m, 2n-1] 0 <= u_p,k <= 1. percent of sample p made by clone k. None if err_msg
+#         err_msg (None or str) None if no error occurs. str with error message if one does
+def get_U(F_phasing, C, n, l, only_leaf, backend='gurobi'):
+    mm, U_idx = mb.build_U_model(F_phasing, C, n, only_leaf)
+    if U_LP_HIGHS:
+        sol, err_msg = _linprog_highs(mm)
+    else:
+        lp = bk.get_backend(backend)
+        lp.load(mm)
+        _, sol = lp.solve()
+        err_msg = None if sol is not None else 'get_U did not solve the LP (' + backend + ' status ' + str(lp.stats['status']) + ')'
+    if err_msg != None:
+        return None, err_msg
+    U = np.clip(sol[U_idx], 0.0, 1.0)
+
+    U[U <= U_MIN] = 0.0
 
     # renormalize U so all rows sum to 1
-    rowsums = np.sum(U, 1)
-    for i in xrange(m):
-        U[i, :] = U[i, :] / rowsums[i]
-
-    return U
+    return U / np.sum(U, 1)[:, np.newaxis], None
+
+
+#  input: mm (MatrixModel) LP with only continuous variables
+# output: sol (np.array of float or None) [mm.num_vars] optimal solution. None if err_msg
+#         err_msg (None or str) see get_U
+def _linprog_highs(mm):
+    A_ub, b_ub, A_eq, b_eq = [], [], [], []
+    for name, (A, sense, rhs) in mm.blocks.items():
+        A = mm.matrix(name)
+        if sense == '==':
+            A_eq.append(A)
+            b_eq.append(rhs)
+        else:
+            sign = 1.0 if sense == '<=' else -1.0
+            A_ub.append(sign * A)
+            b_ub.append(sign * rhs)
+    bounds = [ (lb, ub if np.isfinite(ub) else None) for lb, ub in zip(mm.lb(), mm.ub()) ]
+    res = opt.linprog(mm.obj(), A_ub = sp.vstack(A_ub, format = 'csr'), b_ub = np.concatenate(b_ub), A_eq = sp.vstack(A_eq, format = 'csr'),
+                      b_eq = np.concatenate(b_eq), bounds = bounds, method = 'highs')
+    if res.status != 0 or res.x is None:
+        return None, 'get_U did not solve the LP (highs status ' + str(res.status) + '): ' + str(res.message)
+    return res.x, None
 
 
 #  input: F (np.array of float) [m, l+g+2r] mixed copy number f_p,s of mutation s in sample p
@@ -139,6 +259,12 @@ def get_U(F_phasing, C, n, l, only_leaf):
 #         lamb1 (float) regularization term to weight total tree cost against unmixing error
 #         lamb2 (float) regularization term to weight breakpoint frequency error
 #         time_limit (int) maximum number of seconds the solver will run
+#         builder (str) 'matrix' builds the model with the vectorized matrix builder. 'loop' builds it one element at a time
+#         symmetry (bool) if True keep one labelling of interchangeable nodes and scRNA clones. only used by the 'matrix' builder
+#           with matching 'milp'
+#         formulation (str) encoding of the copy number indicators, one of mb.FORMULATIONS. only used by the 'matrix' builder
+#         backend (str) MILP solver, one of bk.BACKENDS. the 'loop' builder always uses gurobi
+#         matching (str) how nodes are matched to scRNA clones, one of mb.MATCHINGS. only used by the 'matrix' builder
 # output: obj_val (float) objective value of solution
 #         C (np.array of int) [2n-1, l+g+2r] int copy number c_k,s of mutation s in clone k
 #         E (np.array of int) [2n-1, 2n-1] e_i,j == 1 iff edge (i,j) is in tree. 0 otherwise
@@ -146,7 +272,143 @@ def get_U(F_phasing, C, n, l, only_leaf):
 #         W_all (np.array of int) [2n-1, 2n-1] number of breakpoints appearing along each edge in tree
 #         err_msg (None or str) None if no error occurs. str with error message if one does
 #  notes: l (int) is number of breakpoints. g (int) is the number of single nucleotide variants. r (int) is number of copy number regions
-def get_C(F_phasing, C_RNA, U, Q, G, A, H, n, c_max, lamb1, lamb2, time_limit=None):
+def get_C(F_phasing, C_RNA, U, Q, G, A, H, n, c_max, lamb1, lamb2, time_limit=None, builder='matrix', symmetry=False, formulation='bits', backend='gurobi', matching='milp'):
+    if builder != 'loop':
+        return CSolver(F_phasing, C_RNA, Q, G, n, c_max, lamb1, lamb2, time_limit, symmetry, formulation, backend, matching = matching).solve(U)
+
+    l, _ = G.shape
+    Pi = _get_Pi(F_phasing, Q)
+    mod, gp_vars = _get_C_loop_model(F_phasing, C_RNA, U, Q, G, Pi, n, c_max, lamb1, lamb2)
+    _set_C_params(mod, time_limit)
+    mod.optimize()
+
+    M, C, E, A, R, W_node = _loop_solution(mod, *gp_vars)
+    return mod.objVal, M, C, E, A, R, W_node, W_node[:, :l], W_node[:, l:], None
+
+
+# get_C model that is built once per input and solved for every new U. only the constraint families in
+#   mb.U_CONSTRS depend on U, so only those are rebuilt between solves. every solve is warm started from
+#   the integer part of the previous solution of the same restart (see reset). with matching 'hungarian' the model has no M. each solve uses the
+#   matching of nodes to scRNA clones found after the previous one (mb.MATCH_CONSTRS), and the matching is then
+#   updated to the linear assignment with the least copy number distance to the new C (see match_rna)
+class CSolver:
+
+    #  input: see get_C
+    #         backend (str) MILP solver, one of bk.BACKENDS
+    #         mip_gap (float or None) relative MIP gap at which each solve stops. None keeps the solver default
+    #         matching (str) one of mb.MATCHINGS
+    def __init__(self, F_phasing, C_RNA, Q, G, n, c_max, lamb1, lamb2, time_limit=None, symmetry=False, formulation='bits', backend='gurobi', mip_gap=None, matching='milp'):
+        self.F_phasing, self.C_RNA, self.Q, self.G = F_phasing, C_RNA, Q, G
+        self.n, self.c_max, self.lamb1, self.lamb2 = n, c_max, lamb1, lamb2
+        self.symmetry, self.formulation, self.matching = symmetry, formulation, matching
+        self.match = np.arange(2 * n - 1)  # scRNA clone of each node. only used by 'hungarian'
+        self.Pi = _get_Pi(F_phasing, Q)
+        self.backend, self.backend_name = bk.get_backend(backend, time_limit, mip_gap), backend
+        self.mm = None
+        self.stats = {}  # model size, build and solve times and backend stats of the last solve
+
+    # the next solve starts from nothing and the identity matching, as if the model was just built. the model itself is
+    #   kept. get_UCE calls it before the first solve of each restart, so restarts that share a CSolver do not depend on
+    #   which ran before
+    def reset(self):
+        self.backend.clear_start()
+        self.match = np.arange(2 * self.n - 1)
+
+    #  input: U (np.array of float) [m, 2n-1] 0 <= u_p,k <= 1. percent of sample p made by clone k
+    #         callback (function or None) gurobi callback passed to optimize. ignored by other backends
+    #         time_limit (float or None) seconds of this solve. None uses the time limit the solver was built with
+    #         rna_start (bool) start from mb.rna_start, built from the scRNA clones, instead of the last solution (nothing at
+    #           the first solve after reset)
+    # output: same as get_C
+    def solve(self, U, callback=None, time_limit=None, rna_start=False):
+        t = time.time()
+        N = 2 * self.n - 1
+        hungarian = self.matching == 'hungarian'
+        if rna_start and hungarian:
+            self.match = mb.rna_tree(self.C_RNA[:N], self.n)[0]
+        if self.mm is None:
+            self.mm, self.idx = mb.build_C_model(self.F_phasing, self.C_RNA, U, self.Q, self.G, self.Pi, self.n, self.c_max, self.lamb1, self.lamb2, self.symmetry, self.formulation, self.matching, self.match)
+            self.backend.load(self.mm)
+        else:  # only the U dependent constraint families (and the matching) change
+            names = mb.U_CONSTRS + (mb.MATCH_CONSTRS if hungarian else [])
+            for name in names:
+                self.mm.remove_constrs(name)
+            mb.set_U_constraints(self.mm, self.idx, self.F_phasing, self.Pi, U, self.symmetry)
+            if hungarian:
+                mb.set_match_constraints(self.mm, self.idx, self.C_RNA, self.match)
+            self.backend.update(self.mm, names)
+
+        if rna_start:
+            self.backend.set_start(mb.rna_start(self.mm, self.idx, self.C_RNA, self.Q, self.n, self.c_max))
+        build_time = time.time() - t
+        obj_val, sol = self.backend.solve(callback, time_limit)
+        self.stats = { 'backend': self.backend_name, 'num_vars': self.mm.num_vars, 'num_constrs': self.mm.num_constrs(),
+                       'build_time': build_time, 'solve_time': self.backend.runtime }
+        self.stats.update(self.backend.stats)
+        if sol is None:
+            return None, None, None, None, None, None, None, None, None, 'get_C found no solution within the time limit'
+
+        l, _ = self.G.shape
+        M, C, E, A, R, W_node = _matrix_solution(sol, self.idx)
+        if hungarian:
+            l_g, r2 = self.Q.shape[0], self.C_RNA.shape[1]
+            C_seg, P = C[:, l_g:l_g + r2], self.C_RNA[:N]
+            match = match_rna(C_seg, P)
+            obj_val += np.abs(C_seg - P[match]).sum() - np.abs(C_seg - P[self.match]).sum()  # the matching term of the new matching
+            self.match, M = match, np.eye(N)[match]
+        return obj_val, M, C, E, A, R, W_node, W_node[:, :l], W_node[:, l:], None
+
+
+#  input: C_seg (np.array of float) [2n-1, 2r] segment copy numbers of the nodes
+#         P (np.array of float) [2n-1, 2r] segment copy numbers of the scRNA clones
+# output: match (np.array of int) [2n-1] scRNA clone of each node. the one to one matching with the least total L1
+#           distance between the copy numbers of each node and its clone (Hungarian algorithm)
+def match_rna(C_seg, P):
+    cost = np.abs(C_seg[:, np.newaxis, :] - P[np.newaxis, :, :]).sum(axis = 2)
+    rows, cols = opt.linear_sum_assignment(cost)
+    match = np.zeros(len(C_seg), dtype = int)
+    match[rows] = cols
+    return match
+
+
+# output: Pi (np.array of float) [m, l+g] expected bpf (ratio of bp copy num to segment copy num)
+def _get_Pi(F_phasing, Q):
+    l_g, r = Q.shape
+    F_seg = (F_phasing[:, l_g:-r] + F_phasing[:, -r:]).dot(np.transpose(Q))  # [m, l] mixed copy number of segment containing breakpoint
+    return np_divide_0(F_phasing[:, :l_g], F_seg)
+
+
+def _set_C_params(mod, time_limit):
+    mod.params.MIPFocus = 1
+    if time_limit != None:
+        mod.params.TimeLimit = time_limit
+
+
+#  input: see get_C. Pi (np.array of float) [m, l+g] expected bpf (ratio of bp copy num to segment copy num)
+# output: mod (gp.Model) get_C model built with the vectorized matrix builder
+#         gp_vars (tuple) (x (gp.MVar) flat variable vector, idx (dict) columns of the output variables in x)
+def _get_C_matrix_model(F_phasing, C_RNA, U, Q, G, Pi, n, c_max, lamb1, lamb2):
+    mm, idx = mb.build_C_model(F_phasing, C_RNA, U, Q, G, Pi, n, c_max, lamb1, lamb2)
+    backend = bk.GurobiBackend()
+    backend.load(mm)
+    return backend.mod, (backend.x, idx)
+
+
+#  input: sol (np.array of float) [num_vars] solution of the matrix model
+#         idx (dict) columns of the output variables from mb.build_C_model
+# output: M, C, E, A, R (np.array) solved values of the output variables
+#         W_node (np.array of int) [2n-1, l+g] number of times each breakpoint or SNV appears on the edge into each node
+def _matrix_solution(sol, idx):
+    sol = np.append(sol, 0.0)  # column -1 is an edge that cannot be in the tree. its variables are 0
+    W = np.rint(sol[idx['W']]).astype(int)
+    M = sol[idx['M']] if 'M' in idx else None  # 'hungarian' matches outside the model
+    return M, sol[idx['C']], sol[idx['E']], sol[idx['A']], sol[idx['R']], W.sum(axis = 0)
+
+
+#  input: see get_C. Pi (np.array of float) [m, l+g] expected bpf (ratio of bp copy num to segment copy num)
+# output: mod (gp.Model) get_C model built one gurobi variable and constraint at a time
+#         gp_vars (tuple) (M, C, E, A, R, W) np.array of gp.Var of the output variables
+def _get_C_loop_model(F_phasing, C_RNA, U, Q, G, Pi, n, c_max, lamb1, lamb2):
     l_g, r = Q.shape
     #print("r shape",r)
     l, _ = G.shape
@@ -169,9 +431,6 @@ def get_C(F_phasing, C_RNA, U, Q, G, A, H, n, c_max, lamb1, lamb2, time_limit=No
     C_bin = _get_bin_rep(mod, C, c_max)
     Gam = _get_gp_3D_arr_int_var(mod, N, l+g, 2, c_max)
 
-    F_seg = (F_phasing[:, l_g:-r] + F_phasing[:, -r:]).dot(np.transpose(Q))  # [m, l] mixed copy number of segment containing breakpoint
-    Pi = np_divide_0(F_phasing[:, :l_g], F_seg)  # [m, l] expected bpf (ratio of bp copy num to segment copy num)
-
     _set_matching_constraints(mod, M)
     _set_copy_num_constraints(mod, C, n, l, g, r)
     _set_tree_constraints(mod, E, n)
@@ -182,32 +441,15 @@ def get_C(F_phasing, C_RNA, U, Q, G, A, H, n, c_max, lamb1, lamb2, time_limit=No
     _set_bpf_penalty(mod, S, Pi, U, C, Gam)
 
     mod.setObjective(_get_objective(mod, F_phasing, U, M, C,C_RNA, R, S, lamb1, lamb2, l_g), gp.GRB.MINIMIZE)
+    return mod, (M, C, E, A, R, W)
 
-    mod.params.MIPFocus = 1
-    if time_limit != None:
-        mod.params.TimeLimit = time_limit
 
-    mod.optimize()
-    
-    C = _as_solved(C)
-    #C_lg = _as_solved(C_lg) ### nb
-    M = _as_solved(M) ### nb
-    ##C_2r = np.dot(M, C_RNA) ### nb
-    #C = np.concatenate((C_lg, C_2r), axis=1) ### nb
-    E = _as_solved(E)
-    R = _as_solved(R)
-    A = _as_solved(A)
-    W_node_sv = np.zeros((N, l), dtype=int)
-    W_node_snv = np.zeros((N, g), dtype=int)
-    W_node = np.zeros((N, l+g), dtype=int)
-    for j in xrange(0, N):
-        for b in xrange(0, l):
-            W_node_sv[j, b] = sum([int(W[i, j, b].X) for i in xrange(0, N)])
-        for b in xrange(0, g):
-            W_node_snv[j, b] = sum([int(W[i, j, l+b].X) for i in xrange(0, N)])
-        for b in xrange(0, l+g):
-            W_node[j, b] = sum([int(W[i, j, b].X) for i in xrange(0, N)])
-    return mod.objVal, M, C, E, A, R, W_node, W_node_sv, W_node_snv, None
+#  input: mod (gp.Model) solved model from _get_C_loop_model
+# output: M, C, E, A, R (np.array) solved values of the output variables
+#         W_node (np.array of int) [2n-1, l+g] number of times each breakpoint or SNV appears on the edge into each node
+def _loop_solution(mod, M, C, E, A, R, W):
+    M, C, E, A, R, W = _as_solved(mod, [ M, C, E, A, R, W ])
+    return M, C, E, A, R, np.rint(W).astype(int).sum(axis = 0)
 
 
 
@@ -289,6 +531,7 @@ def _set_cost_constraints(mod, R, C, E, n, l, g, r, c_max):
 ### xf: improve the constraints for SV related to CNV, replace the set_bp_appearance_constraints in add_phasing
 def _set_bp_gain_and_loss_constraints(mod, C_bin, C, W, E, G, n, l, g, Gam, c_max, D):
     N = 2 * n - 1
+    mates = [ (s, t) for s, t in zip(*np.nonzero(G)) if s < t ]
     X = _get_gp_3D_arr_int_var(mod, N, N, l+g, 3)
     for i in xrange(0, N):
         for j in xrange(0, N):
@@ -299,10 +542,8 @@ def _set_bp_gain_and_loss_constraints(mod, C_bin, C, W, E, G, n, l, g, Gam, c_ma
         for j in xrange(0, N):
             for b in xrange(0, l+g):  # set W as bp appearance
                 mod.addConstr(W[i, j, b] == 1 - X_bin[i, j, b])
-            for s in xrange(0, l):
-                for t in xrange(0, l):  # breakpoint pairs appear on same edge, not include SNVs
-                    mod.addConstr(W[i, j, s] - W[i, j, t] <= 1 - G[s, t])
-                    mod.addConstr(W[i, j, s] - W[i, j, t] >= - 1 + G[s, t])
+            for s, t in mates:  # breakpoint pairs appear on same edge, not include SNVs. unmated pairs are unconstrained
+                mod.addConstr(W[i, j, s] == W[i, j, t])
     for b in xrange(0, l+g):  # breakpoints only appear once in the tree
         mod.addConstr(gp.quicksum([W[i, j, b] for i in xrange(0, N) for j in xrange(0, N)]) == 1)
     for i in xrange(0, N):
@@ -510,13 +751,13 @@ def _get_3D_bin_rep(mod, X, vmax):
 
 
 # returns numpy array of solved values
-def _as_solved(X):
-    m, n = X.shape
-    Y = np.empty((m, n))
-    for i in xrange(0, m):
-        for j in xrange(0, n):
-            Y[i, j] = X[i, j].X
-    return Y
+#  input: mod (gp.Model) solved model
+#         Xs (list of np.array of gp.Var) arrays of variables of mod
+# output: Ys (list of np.array of float) [X.shape] solved values of each array, read with one getAttr call
+def _as_solved(mod, Xs):
+    vals = np.array(mod.getAttr('X', [ x for X in Xs for x in X.ravel() ]))
+    ends = np.cumsum([ X.size for X in Xs ])[:-1]
+    return [ Y.reshape(X.shape) for X, Y in zip(Xs, np.split(vals, ends)) ]
 
 
 # # # # # # # # # # # # # # # # # # # #
@@ -0,0 +1,61 @@
+#     file: telemetry.py
+#  purpose: Machine readable record of solver progress. Every get_U and get_C call of the coordinate descent is
+#           written as one JSON object per line to a file in the output directory, so incumbent and bound
+#           trajectories, model sizes and build versus solve times can be analyzed after a run
+
+
+# # # # # # # # # # #
+#   I M P O R T S   #
+# # # # # # # # # # #
+
+import os
+import json
+import math
+import time
+
+
+# # # # # # # # # # # # #
+#   C O N S T A N T S   #
+# # # # # # # # # # # # #
+
+TELEMETRY_FNAME = 'solver_telemetry.jsonl'
+INF_BOUND = 1e100  # gurobi reports missing incumbents and bounds as +-1e100
+
+
+# # # # # # # # # # # # # # # # # # # # #
+#   T E L E M E T R Y   C L A S S       #
+# # # # # # # # # # # # # # # # # # # # #
+
+class Telemetry:
+
+    #  input: fname (str) .jsonl file to write to. it is emptied here, so build one Telemetry per run and pass it to
+    #           the worker processes, which append to the same file
+    #         append (bool) keep the records already in fname, for a resumed run
+    def __init__(self, fname, append = False):
+        self.fname = fname
+        open(fname, 'a' if append else 'w').close()
+
+    #  input: event (str) kind of record ('get_U', 'get_C', ...)
+    #         fields (dict) values of the record. nan, inf and +-1e100 floats are written as null
+    def write(self, event, **fields):
+        record = { 'event': event, 'time': time.time(), 'pid': os.getpid() }
+        record.update(fields)
+        line = json.dumps(_sanitize(record), sort_keys = True) + '\n'
+        fd = os.open(self.fname, os.O_WRONLY | os.O_APPEND | os.O_CREAT)  # one write per line so processes do not interleave
+        try:
+            os.write(fd, line.encode('utf-8'))
+        finally:
+            os.close(fd)
+
+
+# converts numpy scalars to python values and non finite floats to None, recursively
+def _sanitize(x):
+    if isinstance(x, dict):
+        return dict([ (k, _sanitize(v)) for k, v in x.items() ])
+    if isinstance(x, (list, tuple)):
+        return [ _sanitize(v) for v in x ]
+    if hasattr(x, 'item'):  # numpy scalar
+        x = x.item()
+    if isinstance(x, float) and (math.isnan(x) or math.isinf(x) or abs(x) >= INF_BOUND):
+        return None
+    return x
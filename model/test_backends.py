@@ -0,0 +1,108 @@
+#     file: test_backends.py
+#  purpose: Parity test of the MILP backends. Solves get_C for the same random U with every installed backend on the
+#           simulation_data inputs and checks that the optimal objective values agree. Also checks that matching the
+#           nodes to scRNA clones outside the model ('hungarian') reaches the same optimum when it starts from the
+#           matching the model finds. the matching test is solved with --backend (gurobi by default)
+#    usage: python model/test_backends.py -i simulation_data/input/sample/ -f simulation_data/input/C_scRNA_CNVs.tsv -n 2 -c 10
+
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'help'))
+import solver as sv
+import backends as bk
+import generate_matrices as gm
+
+
+# # # # # # # # # # # # #
+#   C O N S T A N T S   #
+# # # # # # # # # # # # #
+
+REL_TOL = 1e-3  # every backend stops at a relative MIP gap of 1e-4
+
+
+def main(argv):
+    args = get_args(argv)
+    mats = gm.get_mats(args.input_directory, args.scRNA_file, args.num_leaves, const = args.constant, sv_ub = args.sv_upperbound)
+    F_phasing, Q, G, C_RNA = mats[0], mats[2], mats[4], mats[16]
+    np.random.seed(args.seed)
+    failed = 0
+    for trial in xrange(0, args.trials):
+        U = sv.gen_U(len(F_phasing), args.num_leaves)
+        failed += test_get_C_parity(F_phasing, C_RNA, U, Q, G, args.num_leaves, args.c_max, args.lambda1, args.lambda2, args.time_limit)
+        failed += test_matching_parity(F_phasing, C_RNA, U, Q, G, args.num_leaves, args.c_max, args.lambda1, args.lambda2, args.time_limit, args.backend)
+    printnow('\n' + str(2 * args.trials - failed) + ' of ' + str(2 * args.trials) + ' parity tests passed\n')
+    sys.exit(1 if failed else 0)
+
+
+# # # # # # # # #
+#   T E S T S   #
+# # # # # # # # #
+
+# output: failed (int) 1 if the backends found different optimal objective values. 0 otherwise
+def test_get_C_parity(F_phasing, C_RNA, U, Q, G, n, c_max, lamb1, lamb2, time_limit):
+    backends = bk.available_backends()
+    if len(backends) < 2:
+        printnow('skipped: only ' + str(backends) + ' of ' + str(bk.BACKENDS) + ' can be imported\n')
+        return 0
+    objs = {}
+    for backend in backends:
+        c_solver = sv.CSolver(F_phasing, C_RNA, Q, G, n, c_max, lamb1, lamb2, time_limit, backend = backend)
+        obj_val = c_solver.solve(U)[0]
+        printnow('%-8s obj %s  optimal %s  %.2f seconds\n' % (backend, obj_val, c_solver.backend.is_optimal, c_solver.backend.runtime))
+        if not c_solver.backend.is_optimal:
+            printnow('skipped: ' + backend + ' did not prove optimality within the time limit\n')
+            return 0
+        objs[backend] = obj_val
+    vals = objs.values()
+    if max(vals) - min(vals) > REL_TOL * max(1.0, abs(min(vals))):
+        printnow('FAILED: objective values differ ' + str(objs) + '\n')
+        return 1
+    return 0
+
+
+# output: failed (int) 1 if get_C with the matching fixed to the one the 'milp' matching finds, and then updated by
+#           sv.match_rna, has a different optimal objective value. 0 otherwise. both are solved with backend
+def test_matching_parity(F_phasing, C_RNA, U, Q, G, n, c_max, lamb1, lamb2, time_limit, backend):
+    objs = {}
+    c_solver = sv.CSolver(F_phasing, C_RNA, Q, G, n, c_max, lamb1, lamb2, time_limit, backend = backend)
+    objs['milp'], M = c_solver.solve(U)[:2]
+    h_solver = sv.CSolver(F_phasing, C_RNA, Q, G, n, c_max, lamb1, lamb2, time_limit, backend = backend, matching = 'hungarian')
+    h_solver.match = np.argmax(M, axis = 1)
+    objs['hungarian'] = h_solver.solve(U)[0]
+    printnow('matching obj %s\n' % objs)
+    if not c_solver.backend.is_optimal or not h_solver.backend.is_optimal:
+        printnow('skipped: ' + backend + ' did not prove optimality within the time limit\n')
+        return 0
+    if abs(objs['milp'] - objs['hungarian']) > REL_TOL * max(1.0, abs(objs['milp'])):
+        printnow('FAILED: objective values differ ' + str(objs) + '\n')
+        return 1
+    return 0
+
+
+def printnow(s):
+    sys.stdout.write(s)
+    sys.stdout.flush()
+
+
+def get_args(argv):
+    parser = argparse.ArgumentParser(prog = 'test_backends.py', description = 'parity test of the get_C MILP backends')
+    parser.add_argument('-i', '--input_directory', default = 'simulation_data/input/sample/', help = 'directory containing a .vcf for each sample')
+    parser.add_argument('-f', '--scRNA_file', default = 'simulation_data/input/C_scRNA_CNVs.tsv', help = 'scRNA .tsv file')
+    parser.add_argument('-n', '--num_leaves', default = 2, type = int, help = 'number of leaves')
+    parser.add_argument('-c', '--c_max', default = 10, type = int, help = 'maximum copy number')
+    parser.add_argument('-C', '--constant', default = 120, type = int, help = 'scaling constant for sampling SNVs')
+    parser.add_argument('-sv_ub', '--sv_upperbound', default = 80, type = int, help = 'scaling constant for sampling SVs')
+    parser.add_argument('--lambda1', default = 0.25, type = float, help = 'weight of the tree cost')
+    parser.add_argument('--lambda2', default = 6.25, type = float, help = 'weight of the breakpoint frequency error')
+    parser.add_argument('-m', '--time_limit', default = 600, type = int, help = 'time limit (seconds) of each solve')
+    parser.add_argument('--trials', default = 3, type = int, help = 'number of random U to test')
+    parser.add_argument('--seed', default = 0, type = int, help = 'seed of the random U')
+    parser.add_argument('--backend', default = 'gurobi', choices = bk.BACKENDS, help = 'MILP solver of the matching parity test')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
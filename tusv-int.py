@@ -9,6 +9,10 @@ import sys      # for command line arguments
 import os       # for manipulating files and folders
 import argparse # for command line arguments
 import random
+import time
+import signal
+import shutil
+import tempfile
 import numpy as np
 import multiprocessing as mp
 
@@ -21,6 +25,12 @@ from cStringIO import StringIO # for converting string to file (for creating ini
 sys.path.insert(0, 'model/')
 sys.path.insert(0, 'help/')
 import solver as sv
+import matrix_builder as mb  # get_C model formulations
+import backends as bk        # get_C MILP solvers
+import telemetry as tl       # solver progress records
+import checkpoint as ck      # resuming evicted runs
+import init_u as iu          # initial U strategies
+import run_profile as rp     # per stage time and memory of a run
 import file_manager as fm      # sanitizes file and directory arguments
 import generate_matrices as gm # gets F, Q, G, A, H from .vcf files
 import printer as pt
@@ -37,8 +47,12 @@ MAX_COPY_NUM = 20
 MAX_CORD_DESC_ITERS = 1000
 MAX_RESTART_ITERS = 1000
 NUM_CORES = mp.cpu_count()
+MAX_SEED = 2**31 - 1
 METADATA_FNAME = 'data/2017_09_18_metadata.vcf'
+MIN_SCAN_ERR = 1e-8  # keeps the log in scan_score finite for a perfect fit
+DONE_FNAME = 'training_objective'  # objective of the solution in the output directory. replaced last
 STR_DTYPE = 'S50'
+RESULT_POLL_SECONDS = 1.0  # longest wait for a worker result before the main process can handle SIGTERM
 
 
 # # # # # # # # # # # # #
@@ -47,28 +61,61 @@ STR_DTYPE = 'S50'
 
 def main(argv):
     args = get_args(argv)
+    if args['seed'] is None: # draw a seed so that the run can be reproduced from parameters.txt
+        args['seed'] = random.SystemRandom().randint(0, MAX_SEED)
     write_readme(args['output_directory'], args)
-    unmix(args['input_directory'], args['output_directory'], args['scRNA_file'], args['num_leaves'], args['c_max'], args['lambda1'], args['lambda2'], args['restart_iters'], args['cord_desc_iters'], args['processors'], args['time_limit'], args['metadata_file'], args['num_subsamples'], args['overide_lambdas'], args['constant'], args['sv_upperbound'], args['only_leaf'], args['collapse'], args['threshold'], args['multi_num_clones'])
+    c_opts = { 'symmetry': args['symmetry_breaking'], 'formulation': args['formulation'], 'backend': args['backend'], 'mip_gap': args['mip_gap'], 'matching': args['matching'] }
+    uce_opts = { 'obj_tol': args['obj_tol'], 'stall_iters': args['stall_iters'], 'detect_cycles': not args['no_cycle_detection'], 'init_noise': args['init_noise'], 'rna_start': args['rna_start'] }
+    out_dir = args['output_directory']
+    cprofile_dir = os.path.join(out_dir, rp.CPROFILE_DIR) if args['cprofile'] else None
+    prof = rp.RunProfile(os.path.join(out_dir, rp.PROFILE_FNAME), cprofile_dir)
+    try:
+        unmix(args['input_directory'], args['output_directory'], args['scRNA_file'], args['num_leaves'], args['c_max'], args['lambda1'], args['lambda2'], args['restart_iters'], args['cord_desc_iters'], args['processors'], args['time_limit'], args['metadata_file'], args['num_subsamples'], args['overide_lambdas'], args['constant'], args['sv_upperbound'], args['only_leaf'], args['collapse'], args['threshold'], args['multi_num_clones'], args['seed'], c_opts, uce_opts, args['time_budget'], args['resume'], args['scan_patience'], args['init'], prof)
+    except Terminated:
+        printnow('stopped by SIGTERM. ' + args['output_directory'] + ' has the best solution found so far\n')
+        sys.exit(128 + signal.SIGTERM)
+    finally:
+        prof.write(os.path.join(out_dir, tl.TELEMETRY_FNAME))
 
 
 #  input: num_seg_subsamples (int or None) number of segments to include in deconvolution. these are
 #           in addition to any segments contining an SV as thos are manditory for the SV. None is all segments
+#         c_opts (dict or None) keyword arguments of sv.CSolver selecting how the get_C model is formulated
+#         uce_opts (dict or None) keyword arguments of sv.get_UCE selecting when coordinate descent stops
+#         time_budget (float or None) seconds the whole run may take. the time is shared by the restarts (or numbers of
+#           clones) and their coordinate descent iterations. None is no limit
+#         resume (bool) continue from the checkpoints of an earlier run with the same output directory instead of
+#           starting over. the parsed inputs, finished restarts and the last iteration of unfinished ones are reused
+#         scan_patience (int or None) with multi_num_clones, stop the scan once the score of this many consecutive
+#           numbers of leaves is not better than the best one. None scans all numbers of leaves
+#         inits (list of str or None) iu.STRATEGIES of the initial U. restart (or number of clones) i uses
+#           inits[i % len(inits)]. None is ['random']
+#         prof (rp.RunProfile or None) records the time of each stage and the sizes of the inputs. None records nothing
+#  notes: the output directory always holds the best solution found so far. SIGTERM raises Terminated
 def unmix(in_dir, out_dir, scrna_file, n, c_max, lamb1, lamb2, num_restarts, num_cd_iters, num_processors, time_limit, metadata_fname, \
-          num_seg_subsamples, should_overide_lambdas, const, sv_ub, only_leaf, collapse, threshold, multi_num_clones=False):
-    
-    F_phasing_full, F_unsampled_phasing_full, Q_full, Q_unsampled_full, G, G_unsampled, A, H, bp_attr, cv_attr, F_info_phasing, \
-    F_unsampled_info_phasing, sampled_snv_list_sort, unsampled_snv_list_sort, sampled_sv_list_sort, unsampled_sv_list_sort, C_RNA, l_ab_s, g_ab_s,l_ab_un, g_ab_un = gm.get_mats(in_dir, scrna_file, n, const=const, sv_ub=sv_ub)
-    Q_full, Q_unsampled_full, G, A, H, F_phasing_full, F_unsampled_phasing_full = check_valid_input(Q_full, Q_unsampled_full,G, A, H, F_phasing_full, F_unsampled_phasing_full)
-
-    np.savetxt(out_dir + "/F_info_phasing.csv", F_info_phasing, delimiter='\t', fmt='%s')
-    np.savetxt(out_dir + "/F_unsampled_info_phasing.csv", F_unsampled_info_phasing, delimiter='\t', fmt='%s')
-    np.savetxt(out_dir + "/sampled_snv_list_sort.csv", sampled_snv_list_sort, delimiter='\t', fmt='%d')
-    np.savetxt(out_dir + "/unsampled_snv_list_sort.csv", unsampled_snv_list_sort, delimiter='\t', fmt='%d')
-    np.savetxt(out_dir + "/sampled_sv_list_sort.csv", sampled_sv_list_sort, delimiter='\t', fmt='%d')
-    np.savetxt(out_dir + "/unsampled_sv_list_sort.csv", unsampled_sv_list_sort, delimiter='\t', fmt='%d')
-    F_phasing, Q, Q_unsampled, org_indxs = randomly_remove_segments(F_phasing_full, Q_full, Q_unsampled_full, num_seg_subsamples)
-    np.savetxt(out_dir + '/F_phasing.tsv', F_phasing, delimiter='\t', fmt='%.8f')
-    np.savetxt(out_dir + '/F_unsampled_phasing_full.tsv', F_unsampled_phasing_full, delimiter='\t', fmt='%.8f')
+          num_seg_subsamples, should_overide_lambdas, const, sv_ub, only_leaf, collapse, threshold, multi_num_clones=False, seed=None, c_opts=None, uce_opts=None, time_budget=None, resume=False, scan_patience=None, inits=None, prof=None):
+    if prof is None:
+        prof = rp.RunProfile(None)
+    if c_opts is None:
+        c_opts = {}
+    if uce_opts is None:
+        uce_opts = {}
+    deadline = None if time_budget is None else time.time() + time_budget
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    telemetry = tl.Telemetry(os.path.join(out_dir, tl.TELEMETRY_FNAME), append = resume)
+    ckpt_dir = ck.get_dir(out_dir, resume)
+    inputs = ck.load(os.path.join(ckpt_dir, ck.INPUTS_FNAME)) if resume else None
+    if inputs is None:
+        inputs = parse_inputs(in_dir, out_dir, scrna_file, n, const, sv_ub, num_seg_subsamples, seed, prof, num_processors)
+        ck.save(os.path.join(ckpt_dir, ck.INPUTS_FNAME), inputs)
+    else:
+        printnow('resuming from the checkpoints in ' + ckpt_dir + '\n')
+        seed = inputs['seed']  # restarts that have not started yet get the seeds of the evicted run
+    F_phasing, F_phasing_full, F_unsampled_phasing_full, Q, Q_unsampled, G, G_unsampled, A, H, bp_attr, cv_attr, sampled_snv_list_sort, \
+    unsampled_snv_list_sort, sampled_sv_list_sort, unsampled_sv_list_sort, C_RNA, l_ab_s, g_ab_s, l_ab_un, g_ab_un, org_indxs = inputs['mats']
+    random.setstate(inputs['random_state'])
+    np.random.set_state(inputs['np_random_state'])
+    prof.add_sizes(F_phasing = F_phasing, F_phasing_full = F_phasing_full, F_unsampled_phasing_full = F_unsampled_phasing_full, Q = Q, Q_unsampled = Q_unsampled, G = G, C_RNA = C_RNA)
     # replace lambda1 and lambda2 with input derived values if should_orveride_lamdas was specified
     m = len(F_phasing)
     l_g, r = Q.shape
@@ -79,79 +126,111 @@ def unmix(in_dir, out_dir, scrna_file, n, c_max, lamb1, lamb2, num_restarts, num
         lamb1 = float(l_g + 2*r) / float(2*r) * float(m) / float(2 * (n-1) )/2
         lamb2 = float(l_g + 2*r) / float(l_g)/2
 
-    Us, Ms, Cs, Es, As, obj_vals, Rs, Ws, W_SVs, W_SNVs = [], [], [], [], [], [], [], [], [], []
     num_complete = 0
     if not multi_num_clones:
-        for i in xrange(0, num_restarts):
-            U, M, C, E, A_, R, W, W_SV, W_SNV, obj_val, err_msg = sv.get_UCE(F_phasing, C_RNA, Q, G, A, H, n, c_max, lamb1, lamb2, num_cd_iters, time_limit, only_leaf)
-            printnow(str(i + 1) + ' of ' + str(num_restarts) + ' random restarts complete\n')
-            Us.append(U)
-            Cs.append(C)
-            Ms.append(M)
-            Es.append(E)
-            As.append(A_)
-            Rs.append(R)
-            Ws.append(W)
-            W_SVs.append(W_SV)
-            W_SNVs.append(W_SNV)
-            obj_vals.append(obj_val)
-
-        best_i = 0
-        best_obj_val = obj_vals[best_i]
-        for i, obj_val in enumerate(obj_vals):
-            if obj_val < best_obj_val:
-                best_obj_val = obj_val
-                best_i = i
-
-        with open(out_dir + "/training_objective", 'w') as f:
-            f.write(str(best_obj_val))
-        E_pre = copy.deepcopy(Es[best_i])
-        R_pre = copy.deepcopy(Rs[best_i])
-        W_pre = copy.deepcopy(Ws[best_i])
-        M_pre = copy.deepcopy(Ms[best_i]) ### nb
-        if collapse:
-            U_best, M_best, C_best, E_best, A_best, R_best, W_best, W_SV_best, W_SNV_best = collapse_nodes(Us[best_i], Ms[best_i], Cs[best_i], Es[best_i], As[best_i], Rs[best_i], Ws[best_i], W_SVs[best_i], W_SNVs[best_i], threshold,only_leaf)
-        else:
-            U_best, M_best, C_best, E_best, A_best, R_best, W_best, W_SV_best, W_SNV_best = Us[best_i], Ms[best_i], Cs[best_i], Es[best_i], As[best_i], Rs[best_i], Ws[best_i], W_SVs[best_i], W_SNVs[best_i]
-        min_node, min_dist, W_unsampled = snv_assign(C_best[:, -2*r:], Q_unsampled, A_best, E_best, U_best, F_unsampled_phasing_full, G_unsampled)
-        np.savetxt(out_dir + "/unsampled_assignment.csv", min_node, delimiter=',')
-        np.savetxt(out_dir + "/unsampled_assignment_dist.csv", min_dist, delimiter=',')
-        ### concatenate unsampled SV and SNV list
-        W_SV_unsampled = W_unsampled[:,:len(unsampled_sv_list_sort)]
-        W_SNV_unsampled = W_unsampled[:,len(unsampled_sv_list_sort):]
-        W_con = concatenate_W(W_SV_best, W_SV_unsampled, W_SNV_best, W_SNV_unsampled, sampled_sv_list_sort, unsampled_sv_list_sort, sampled_snv_list_sort, unsampled_snv_list_sort, l_ab_s, g_ab_s,l_ab_un, g_ab_un)
-        writer = None #build_vcf_writer(F_phasing_full, C_best, org_indxs, G, Q, bp_attr, cv_attr, metadata_fname)
-        B = create_binary_matrix(W_con, A_best)
-        write_to_files(out_dir, l_g, U_best, M_best, C_best, E_best, R_best, W_best, W_SV_best, W_SNV_best, W_unsampled, W_con, obj_vals[best_i], F_phasing_full, F_unsampled_phasing_full, org_indxs, writer, E_pre, R_pre, W_pre, M_pre, B, A_best)
+        # post processes a get_UCE output and writes it to directory d
+        def write_solution(d, out):
+            U_best, M_best, C_best, E_best, A_best, R_best, W_best, W_SV_best, W_SNV_best, best_obj_val, _ = out
+            E_pre = copy.deepcopy(E_best)
+            R_pre = copy.deepcopy(R_best)
+            W_pre = copy.deepcopy(W_best)
+            M_pre = copy.deepcopy(M_best) ### nb
+            if collapse:
+                with prof.stage('collapse_nodes'):
+                    U_best, M_best, C_best, E_best, A_best, R_best, W_best, W_SV_best, W_SNV_best = collapse_nodes(U_best, M_best, C_best, E_best, A_best, R_best, W_best, W_SV_best, W_SNV_best, threshold,only_leaf)
+            with prof.stage('snv_assign'):
+                min_node, min_dist, W_unsampled = snv_assign(C_best[:, -2*r:], Q_unsampled, A_best, E_best, U_best, F_unsampled_phasing_full, G_unsampled)
+            np.savetxt(d + "unsampled_assignment.csv", min_node, delimiter=',')
+            np.savetxt(d + "unsampled_assignment_dist.csv", min_dist, delimiter=',')
+            ### concatenate unsampled SV and SNV list
+            W_SV_unsampled = W_unsampled[:,:len(unsampled_sv_list_sort)]
+            W_SNV_unsampled = W_unsampled[:,len(unsampled_sv_list_sort):]
+            W_con = concatenate_W(W_SV_best, W_SV_unsampled, W_SNV_best, W_SNV_unsampled, sampled_sv_list_sort, unsampled_sv_list_sort, sampled_snv_list_sort, unsampled_snv_list_sort, l_ab_s, g_ab_s,l_ab_un, g_ab_un)
+            writer = None #build_vcf_writer(F_phasing_full, C_best, org_indxs, G, Q, bp_attr, cv_attr, metadata_fname)
+            B = create_binary_matrix(W_con, A_best)
+            with prof.stage('write_to_files'):
+                write_to_files(d, l_g, U_best, M_best, C_best, E_best, R_best, W_best, W_SV_best, W_SNV_best, W_unsampled, W_con, best_obj_val, F_phasing_full, F_unsampled_phasing_full, org_indxs, writer, E_pre, R_pre, W_pre, M_pre, B, A_best)
+            with open(d + DONE_FNAME, 'w') as f:
+                f.write(str(best_obj_val))
+
+        # every improvement over the best restart so far replaces the output files, so they are complete at any time
+        write_best = lambda out: write_atomically(out_dir, lambda d: write_solution(d, out), DONE_FNAME)
+        uce_args = (F_phasing, C_RNA, Q, G, A, H, n, c_max, lamb1, lamb2, num_cd_iters, time_limit, only_leaf)
+        with prof.stage('coordinate_descent'):  # includes writing every improvement
+            best = run_restarts(uce_args, c_opts, num_restarts, num_processors, seed, telemetry, uce_opts, deadline, write_best, ckpt_dir, inits)
+        raiseif(best is None, 'no random restart finished')
+        raiseif(best[-1] is not None, best[-1])
     else:
-        training_obj = np.zeros(n-1)
-        for n_ in range(2, n+1):
-            U, M, C, E, A_, R, W, W_SV, W_SNV, obj_val, err_msg = sv.get_UCE(F_phasing, C_RNA, Q, G, A, H, n_, c_max, lamb1,
-                                                                              lamb2, num_cd_iters, time_limit, only_leaf)
-            printnow(str(n_) + ' of ' + str(num_restarts) + ' num of clones restarts complete\n')
+        training_obj = np.full(n-1, np.nan)  # nan for numbers of clones not solved (yet)
+        training_err = np.full(n-1, np.nan)  # L1 error of F, which scan_score is computed from
+        # post processes the get_UCE output with n_ leaves and writes it to num_clone_<n_>
+        def write_num_clones(n_, out):
+            U, M, C, E, A_, R, W, W_SV, W_SNV, obj_val, err_msg = out
+            raiseif(err_msg is not None, err_msg)
             training_obj[n_-2] = obj_val
+            training_err[n_-2] = fit_error(F_phasing, U, C)
+            printnow(str(n_) + ' clones complete (' + str(np.count_nonzero(~np.isnan(training_obj))) + ' of ' + str(n-1) + ' num of clones)\n')
             E_pre = copy.deepcopy(E)
             R_pre = copy.deepcopy(R)
             W_pre = copy.deepcopy(W)
             M_pre = copy.deepcopy(M) ### nb
             if collapse:
-                U, M, C, E, A_, R, W, W_SV, W_SNV = collapse_nodes(U,M,C,E,A_,R,W,W_SV, W_SNV,threshold,only_leaf)
-
-            min_node, min_dist, W_SNV_unsampled = snv_assign(C[:, -2 * r:], Q_unsampled, A_, E, U,F_unsampled_phasing_full, G_unsampled)
-            np.savetxt(out_dir + "/unsampled_SNV_assignment.csv", min_node, delimiter=',')
-            np.savetxt(out_dir + "/unsampled_SNV_assignment_dist.csv", min_dist, delimiter=',')
-            W_con, W_snv_con = concatenate_W(W_SV, None, W_SNV, W_SNV_unsampled, None, None, sampled_snv_list_sort,
-                                             unsampled_snv_list_sort, l_ab_s, g_ab_s,l_ab_un, g_ab_un) # nb: changed from below 
-            #W_con, W_snv_con = concatenate_W(W_SV, W_SNV, W_SNV_unsampled, sampled_snv_list_sort,
-            #                                 unsampled_snv_list_sort) # nb: commented
-
-            writer = build_vcf_writer(F_phasing_full, C, org_indxs, G, Q, bp_attr, cv_attr, metadata_fname)
-            B = create_binary_matrix(W_con, A)
+                with prof.stage('collapse_nodes'):
+                    U, M, C, E, A_, R, W, W_SV, W_SNV = collapse_nodes(U,M,C,E,A_,R,W,W_SV, W_SNV,threshold,only_leaf)
+
+            with prof.stage('snv_assign'):
+                min_node, min_dist, W_unsampled = snv_assign(C[:, -2 * r:], Q_unsampled, A_, E, U, F_unsampled_phasing_full, G_unsampled)
+            ### concatenate unsampled SV and SNV list
+            W_SV_unsampled = W_unsampled[:,:len(unsampled_sv_list_sort)]
+            W_SNV_unsampled = W_unsampled[:,len(unsampled_sv_list_sort):]
+            W_con = concatenate_W(W_SV, W_SV_unsampled, W_SNV, W_SNV_unsampled, sampled_sv_list_sort, unsampled_sv_list_sort, sampled_snv_list_sort, unsampled_snv_list_sort, l_ab_s, g_ab_s,l_ab_un, g_ab_un)
+            writer = None #build_vcf_writer(F_phasing_full, C, org_indxs, G, Q, bp_attr, cv_attr, metadata_fname)
+            B = create_binary_matrix(W_con, A_)
+            def write(d):
+                np.savetxt(d + "unsampled_assignment.csv", min_node, delimiter=',')
+                np.savetxt(d + "unsampled_assignment_dist.csv", min_dist, delimiter=',')
+                write_to_files(d, l_g, U, M, C, E, R, W, W_SV, W_SNV, W_unsampled, W_con, obj_val, F_phasing_full, F_unsampled_phasing_full, org_indxs, writer, E_pre, R_pre, W_pre, M_pre, B, A_)
             if not os.path.exists(out_dir + '/num_clone_' + str(n_)):
                 os.mkdir(out_dir + '/num_clone_' + str(n_))
-            write_to_files(out_dir + '/num_clone_' + str(n_) + '/', l_g, U, M, C, E, R, W, W_SV, W_SNV, W_SNV_unsampled,W_con, obj_val, F_phasing_full,
-                           F_unsampled_phasing_full, org_indxs, writer, E_pre, R_pre, W_pre, M_pre, B, A_)
-        np.savetxt(out_dir + '/training_obj_list.csv', training_obj, delimiter='\t')
+            with prof.stage('write_to_files'):
+                write_atomically(out_dir + '/num_clone_' + str(n_), write)
+            write_atomically(out_dir, lambda d: np.savetxt(d + 'training_obj_list.csv', training_obj, delimiter='\t'))  # nan for numbers of clones not done
+
+        uce_args = (F_phasing, C_RNA, Q, G, A, H, n, c_max, lamb1, lamb2, num_cd_iters, time_limit, only_leaf)
+        with prof.stage('coordinate_descent'):  # includes writing every number of clones
+            scores = run_scan(uce_args, c_opts, num_processors, seed, write_num_clones, telemetry, uce_opts, deadline, ckpt_dir, scan_patience, inits)
+        ns = sorted(scores.keys())
+        raiseif(not ns, 'no number of clones was solved')
+        np.savetxt(out_dir + '/scan_scores.tsv', np.array([ [ n_, training_obj[n_-2], training_err[n_-2], scores[n_] ] for n_ in ns ]), delimiter='\t',
+                   fmt=['%d', '%.8f', '%.8f', '%.8f'], header='num_leaves\tobj_val\tl1_error\tscore', comments='')
+        printnow('the best scoring number of leaves is ' + str(min(ns, key = lambda n_: scores[n_])) + '\n')
+
+#  input: see unmix. prof (rp.RunProfile) times parsing the .vcf files and checking them
+#         num_processors (int) number of worker processes the .vcf files are parsed on
+# output: inputs (dict) 'mats' (tuple) matrices parsed from the .vcf files and the scRNA file after segment subsampling,
+#           the seed and the states of the random number generators after subsampling. the matrices are also written
+#           to out_dir
+def parse_inputs(in_dir, out_dir, scrna_file, n, const, sv_ub, num_seg_subsamples, seed, prof, num_processors=1):
+    random.seed(seed)    # segment and mutation subsampling
+    np.random.seed(seed)
+    with prof.stage('get_mats'):
+        F_phasing_full, F_unsampled_phasing_full, Q_full, Q_unsampled_full, G, G_unsampled, A, H, bp_attr, cv_attr, F_info_phasing, \
+        F_unsampled_info_phasing, sampled_snv_list_sort, unsampled_snv_list_sort, sampled_sv_list_sort, unsampled_sv_list_sort, C_RNA, l_ab_s, g_ab_s,l_ab_un, g_ab_un = gm.get_mats(in_dir, scrna_file, n, const=const, sv_ub=sv_ub, num_processors=num_processors)
+    with prof.stage('check_valid_input'):
+        Q_full, Q_unsampled_full, G, A, H, F_phasing_full, F_unsampled_phasing_full = check_valid_input(Q_full, Q_unsampled_full,G, A, H, F_phasing_full, F_unsampled_phasing_full)
+
+    np.savetxt(out_dir + "/F_info_phasing.csv", F_info_phasing, delimiter='\t', fmt='%s')
+    np.savetxt(out_dir + "/F_unsampled_info_phasing.csv", F_unsampled_info_phasing, delimiter='\t', fmt='%s')
+    np.savetxt(out_dir + "/sampled_snv_list_sort.csv", sampled_snv_list_sort, delimiter='\t', fmt='%d')
+    np.savetxt(out_dir + "/unsampled_snv_list_sort.csv", unsampled_snv_list_sort, delimiter='\t', fmt='%d')
+    np.savetxt(out_dir + "/sampled_sv_list_sort.csv", sampled_sv_list_sort, delimiter='\t', fmt='%d')
+    np.savetxt(out_dir + "/unsampled_sv_list_sort.csv", unsampled_sv_list_sort, delimiter='\t', fmt='%d')
+    F_phasing, Q, Q_unsampled, org_indxs = randomly_remove_segments(F_phasing_full, Q_full, Q_unsampled_full, num_seg_subsamples)
+    np.savetxt(out_dir + '/F_phasing.tsv', F_phasing, delimiter='\t', fmt='%.8f')
+    np.savetxt(out_dir + '/F_unsampled_phasing_full.tsv', F_unsampled_phasing_full, delimiter='\t', fmt='%.8f')
+    mats = (F_phasing, F_phasing_full, F_unsampled_phasing_full, Q, Q_unsampled, G, G_unsampled, A, H, bp_attr, cv_attr, sampled_snv_list_sort,
+            unsampled_snv_list_sort, sampled_sv_list_sort, unsampled_sv_list_sort, C_RNA, l_ab_s, g_ab_s, l_ab_un, g_ab_un, org_indxs)
+    return { 'mats': mats, 'seed': seed, 'random_state': random.getstate(), 'np_random_state': np.random.get_state() }
 
 def create_binary_matrix(W_con, A):
     B = copy.deepcopy(W_con)
@@ -442,13 +521,235 @@ def random_subset(lst, k):
                 result[s] = item
     return result
 
-def setup_get_UCE(args):
-    return sv.get_UCE(*args)
+#  input: uce_args (tuple) arguments of sv.get_UCE up to and including only_leaf
+#         c_opts (dict) keyword arguments of sv.CSolver
+#         num_restarts (int) number of random initializations of the coordinate descent
+#         num_processors (int) number of worker processes the restarts are spread over
+#         seed (int or None) master seed. each restart gets its own seed drawn from it
+#         telemetry (telemetry.Telemetry or None) record of every get_U and get_C call of every restart
+#         uce_opts (dict or None) keyword arguments of sv.get_UCE selecting when coordinate descent stops
+#         deadline (float or None) time.time() by which all restarts should be done. each restart gets an even share
+#           of the time left when it starts. restarts after the first round are skipped once it has passed
+#         on_best (function or None) called with every get_UCE output that is better than all earlier ones
+#         ckpt_dir (str or None) directory of the checkpoint of each restart. None does not checkpoint
+#         inits (list of str or None) iu.STRATEGIES of the initial U. restart i uses inits[i % len(inits)], so several
+#           strategies spread the restarts over different starts. None is ['random']
+# output: best (tuple) output of sv.get_UCE with the lowest objective value over all restarts. None if no restart ran
+def run_restarts(uce_args, c_opts, num_restarts, num_processors, seed, telemetry=None, uce_opts=None, deadline=None, on_best=None, ckpt_dir=None, inits=None):
+    seeds = np.random.RandomState(seed).randint(0, MAX_SEED, size = num_restarts)
+    num_workers = max(1, min(num_processors, num_restarts))
+    inits = inits or [ 'random' ]
+    jobs = [ (i, seeds[i], num_restarts, inits[i % len(inits)]) + _round_info(i, num_restarts, num_workers, deadline) for i in xrange(0, num_restarts) ]
+    best = [ None ]  # only the running best is kept so memory does not grow with the number of restarts
+    def keep_best(out):
+        new_best = _best_of([best[0], out])
+        if new_best is not best[0] and new_best[-1] is None and on_best is not None:
+            on_best(new_best)
+        best[0] = new_best
+    _run_jobs(setup_get_UCE, jobs, num_workers, (uce_args, c_opts, telemetry, uce_opts or {}, ckpt_dir), keep_best)
+    return best[0]
+
+#  input: uce_args (tuple) arguments of sv.get_UCE up to and including only_leaf. n (int) is the largest number of
+#           leaves scanned
+#         see run_restarts for the other arguments. every number of leaves from 2 to n is solved once with seed. the
+#           i-th number of leaves to be solved starts from inits[i % len(inits)]
+#         on_result (function) called with (number of leaves, output of sv.get_UCE) as each number of leaves finishes.
+#           numbers of leaves skipped because the deadline passed are not passed to it and not scored
+#         patience (int or None) stop once the scan_score of this many consecutive numbers of leaves is not better than
+#           the best one so far. None solves all numbers of leaves
+# output: scores (dict) key is the number of leaves. val is its scan_score. only numbers of leaves that were solved
+#  notes: the numbers of leaves are solved concurrently on num_processors worker processes. without patience the largest
+#           go first since those take longest. with patience they go smallest first and on_result is called in that
+#           order, so the numbers of leaves that are still running when the scan stops are dropped
+def run_scan(uce_args, c_opts, num_processors, seed, on_result, telemetry=None, uce_opts=None, deadline=None, ckpt_dir=None, patience=None, inits=None):
+    ns = range(uce_args[6], 1, -1) if patience is None else range(2, uce_args[6] + 1)
+    num_workers = max(1, min(num_processors, len(ns)))
+    inits = inits or [ 'random' ]
+    jobs = [ (n_, seed, inits[i % len(inits)]) + _round_info(i, len(ns), num_workers, deadline) for i, n_ in enumerate(ns) ]
+    m, L = uce_args[0].shape
+    scores, pending, state = {}, {}, { 'next': 0, 'best': None, 'stalls': 0 }
+    def score_in_order(res):  # returns True to stop the scan
+        pending[res[0]] = res[1]
+        while state['next'] < len(ns) and ns[state['next']] in pending:
+            n_ = ns[state['next']]
+            out = pending.pop(n_)
+            state['next'] += 1
+            if out is None:  # skipped since the deadline passed
+                continue
+            if out[-1] is not None:  # no solution (ex. get_C found none in its time limit). it stays nan and is not scored
+                printnow(str(n_) + ' clones failed: ' + out[-1] + '\n')
+                continue
+            on_result(n_, out)
+            scores[n_] = scan_score(fit_error(uce_args[0], out[0], out[2]), n_, m, L)
+            if patience is None:
+                continue
+            if state['best'] is None or scores[n_] < scores[state['best']]:
+                state['best'], state['stalls'] = n_, 0
+            else:
+                state['stalls'] += 1
+            if state['stalls'] >= patience:
+                printnow('scan stopped after ' + str(n_) + ' leaves. no better score for ' + str(patience) + ' numbers of leaves\n')
+                return True
+        return False
+    _run_jobs(scan_get_UCE, jobs, num_workers, (uce_args, c_opts, telemetry, uce_opts or {}, ckpt_dir), score_in_order)
+    return scores
+
+#  input: F_phasing (np.array of float) [m, L] mixed copy numbers. U, C (np.array) mixture fractions and copy numbers from
+#           get_UCE
+# output: err (float) L1 error sum |F - UC| of the fit. the data term of the get_C objective, without its tree cost,
+#           breakpoint frequency and scRNA matching terms
+def fit_error(F_phasing, U, C):
+    return float(np.abs(F_phasing - U.dot(C)).sum())
+
+#  input: err (float) fit_error of get_UCE with n leaves. m (int) number of samples. L (int) number of columns of F_phasing
+# output: score (float) BIC-like score of the number of leaves. lower is better
+#  notes: err is the L1 error of the m*L entries of F under a Laplace model. the free parameters are the m*(2n-2)
+#           mixture fractions of U. copy numbers are integer and constrained by the tree, so they are not counted
+def scan_score(err, n, m, L):
+    num_obs = m * L
+    return float(2.0 * num_obs * np.log(max(err, MIN_SCAN_ERR) / num_obs) + m * (2*n - 2) * np.log(num_obs))
+
+# output: round_info (tuple) (deadline, number of rounds of jobs left including job i, whether job i is in the
+#           first round) for job i of num_jobs spread over num_workers
+def _round_info(i, num_jobs, num_workers, deadline):
+    num_rounds = (num_jobs + num_workers - 1) // num_workers
+    return (deadline, num_rounds - i // num_workers, i < num_workers)
+
+# runs func on every job on num_workers worker processes (in this process if there is one) and calls on_result with
+#   each result in the order they finish. the workers are set up with _init_worker(*init_args). if on_result returns
+#   True, the jobs that are left are dropped
+def _run_jobs(func, jobs, num_workers, init_args, on_result):
+    pool = None
+    try:
+        if num_workers == 1:
+            _init_worker(*init_args)
+            results = ( func(job) for job in jobs )
+        else:
+            pool = mp.Pool(num_workers, _init_worker, init_args + (True,))
+            results = _poll(pool.imap_unordered(func, jobs))
+        for result in results:
+            if on_result(result):
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+# python 2.7 does not interrupt a wait on a pool result for signals, so SIGTERM would only be handled once a job
+#   finishes. the results are waited for in short timeouts instead, so the handler runs in between
+def _poll(results):
+    while True:
+        try:
+            yield results.next(RESULT_POLL_SECONDS)
+        except mp.TimeoutError:
+            continue
+        except StopIteration:
+            return
+
+# get_UCE arguments and the get_C model of a worker process. one model is reused by all restarts of the worker. it is
+#   reset at the start of each restart, so the result of a restart does not depend on -p
+_WORKER = {}
+
+def _init_worker(uce_args, c_opts, telemetry, uce_opts, ckpt_dir, in_pool=False):
+    if in_pool:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)  # only the main process handles SIGTERM
+    _WORKER.update({ 'uce_args': uce_args, 'c_opts': c_opts, 'telemetry': telemetry, 'uce_opts': uce_opts, 'ckpt_dir': ckpt_dir, 'c_solver': None })
+
+# output: c_solver (sv.CSolver) get_C model of uce_args with n leaves
+def _get_c_solver(uce_args, c_opts, n):
+    F_phasing, C_RNA, Q, G, _, _, _, c_max, lamb1, lamb2, _, time_limit, _ = uce_args
+    return sv.CSolver(F_phasing, C_RNA, Q, G, n, c_max, lamb1, lamb2, time_limit, **c_opts)
+
+# output: checkpoint (str or None) checkpoint file of a get_UCE run of this worker. None if the run does not checkpoint
+def _get_checkpoint(name):
+    return None if _WORKER['ckpt_dir'] is None else os.path.join(_WORKER['ckpt_dir'], name + '.pkl')
+
+#  input: job (tuple) (restart index, seed of the restart, total restarts, initial U strategy) + _round_info of the restart
+# output: out (tuple or None) output of sv.get_UCE. None if the restart was skipped because the deadline passed
+def setup_get_UCE(job):
+    i, seed, num_restarts, init, deadline, rounds_left, is_first_round = job
+    if deadline is not None and time.time() >= deadline and not is_first_round:
+        return None
+    uce_args = _WORKER['uce_args']
+    if _WORKER['c_solver'] is None:
+        _WORKER['c_solver'] = _get_c_solver(uce_args, _WORKER['c_opts'], uce_args[6])
+    out = sv.get_UCE(*uce_args, seed = seed, c_solver = _WORKER['c_solver'], telemetry = _WORKER['telemetry'], restart = i,
+                     deadline = share_deadline(deadline, rounds_left), checkpoint = _get_checkpoint('restart_' + str(i)), init = init, **_WORKER['uce_opts'])
+    printnow(str(i + 1) + ' of ' + str(num_restarts) + ' random restarts complete\n')
+    return out
+
+#  input: job (tuple) (number of leaves, seed, initial U strategy) + _round_info of the number of leaves
+# output: (n, out) number of leaves and the output of sv.get_UCE with that many leaves. out is None if the number of
+#           leaves was skipped because the deadline passed
+def scan_get_UCE(job):
+    n_, seed, init, deadline, rounds_left, is_first_round = job
+    if deadline is not None and time.time() >= deadline and not is_first_round:
+        return n_, None
+    uce_args = _WORKER['uce_args']
+    uce_args = uce_args[:6] + (n_,) + uce_args[7:]
+    out = sv.get_UCE(*uce_args, seed = seed, c_solver = _get_c_solver(uce_args, _WORKER['c_opts'], n_), telemetry = _WORKER['telemetry'],
+                     deadline = share_deadline(deadline, rounds_left), checkpoint = _get_checkpoint('num_clone_' + str(n_)), init = init, **_WORKER['uce_opts'])
+    return n_, out
+
+# returns the get_UCE output with the lowest objective value. errored or missing outputs are only
+#   returned if no restart succeeded
+def _best_of(results):
+    best = None
+    for out in results:
+        if out is None:
+            continue
+        if best is None or best[-1] is not None or (out[-1] is None and out[-2] < best[-2]):
+            best = out
+    return best
 
 def printnow(s):
     sys.stdout.write(s)
     sys.stdout.flush()
 
+#  input: deadline (float or None) time.time() by which num_parts pieces of work that run one after another are done
+# output: deadline (float or None) time.time() by which the next piece should be done to leave the same time for the rest
+def share_deadline(deadline, num_parts):
+    if deadline is None:
+        return None
+    now = time.time()
+    return now + max(0.0, deadline - now) / num_parts
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # #
+#   A N Y T I M E   O U T P U T                 #
+# # # # # # # # # # # # # # # # # # # # # # # # #
+
+class Terminated(Exception):
+    pass
+
+# SIGTERM raises Terminated in the main process, unless output files are being moved into place. it is then raised
+#   once they all are, so the output directory never mixes two solutions
+_SIGTERM = { 'received': False, 'deferred': False }
+
+def _on_sigterm(signum, frame):
+    _SIGTERM['received'] = True
+    if not _SIGTERM['deferred']:
+        raise Terminated()
+
+#  input: d (str) output directory
+#         write (function) writes output files to the directory passed to it (with a trailing '/')
+#         last (str or None) file renamed after all others, so that it marks a complete output
+#  notes: files are written to a temporary directory in d and renamed into d, which replaces each file atomically
+def write_atomically(d, write, last=None):
+    tmp_dir = tempfile.mkdtemp(prefix = '.partial_', dir = d)
+    try:
+        write(tmp_dir + '/')
+        fnames = sorted(os.listdir(tmp_dir), key = lambda f: f == last)
+        _SIGTERM['deferred'] = True
+        try:
+            for fname in fnames:
+                os.rename(os.path.join(tmp_dir, fname), os.path.join(d, fname))
+        finally:
+            _SIGTERM['deferred'] = False
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors = True)
+    if _SIGTERM['received']:
+        raise Terminated()
+
 
 # # # # # # # # # # # # # # # #
 #   W R I T E   O U T P U T   #
@@ -642,7 +943,7 @@ def raiseif(should_raise, msg):
 
 def get_args(argv):
     parser = argparse.ArgumentParser(prog = 'tusv.py', description = "unmixes mixed copy numbers for breakpoints and segments and infers phylogeny with various phylogenetic constraints")
-    parser.add_argument('-i', '--input_directory', required = True, type = lambda x: fm.valid_dir_ext(parser, x, '.vcf'), help = 'directory containing a .vcf for each sample from a single patient')
+    parser.add_argument('-i', '--input_directory', required = True, type = lambda x: fm.valid_dir_ext(parser, x, gm.VCF_EXTENSIONS), help = 'directory containing a .vcf (or gzip/bgzip .vcf.gz) for each sample from a single patient')
     parser.add_argument('-o', '--output_directory', required = True, type = lambda x: fm.valid_dir(parser, x), help = 'empty directory for output U.tsv, C.tsv, and T.dot files to go')
     parser.add_argument('-f', '--scRNA_file', required = True, type = lambda x: fm.is_valid_file(parser,x), help = '.tsv file containing clone CNVs in each row and chr_start_end_major/minor as column names')
     set_non_dir_args(parser)
@@ -666,6 +967,22 @@ def set_non_dir_args(parser):
     parser.add_argument('-col', '--collapse', action='store_true', help='if collapse nodes')
     parser.add_argument('-th', '--threshold', default = 0.0, type = lambda x: fm.valid_float_above(parser, x, 0.0), help = 'mean frequency threshold to collapsing')
     parser.add_argument('-scan', '--multi_num_clones', action='store_true', help='Scan a range of number of clones to get optimal number of clones')
+    parser.add_argument('-patience', '--scan_patience', default = None, type = lambda x: fm.valid_int_in_range(parser, x, 1, MAX_NUM_LEAVES), help = 'with -scan, solve the numbers of clones smallest first and stop once the BIC-like score in scan_scores.tsv has not improved for this many of them. default scans all')
+    parser.add_argument('-init', '--init', default = [ 'random' ], type = lambda x: fm.valid_choice_list(parser, x, iu.STRATEGIES), help = 'comma separated strategies for the initial U: random (uniform on the simplex), nmf or kmeans (derived from F). restarts cycle through them. default random')
+    parser.add_argument('-init_noise', '--init_noise', default = 0.0, type = lambda x: fm.valid_float_in_range(parser, x, 0.0, 1.0), help = 'weight (0 to 1) of a random U mixed into the nmf and kmeans initial U, so that restarts with the same strategy start further apart. default 0')
+    parser.add_argument('-rna_start', '--rna_start', action = 'store_true', help = 'start the first get_C of each restart from copy numbers, node matching and a tree built from the scRNA clones instead of from nothing (gurobi only)')
+    parser.add_argument('-cprofile', '--cprofile', action = 'store_true', help = 'also profile every stage of run_profile.json with cProfile and dump the stats to the cprofile directory of the output directory')
+    parser.add_argument('-sym', '--symmetry_breaking', action = 'store_true', help = 'add constraints that keep one labelling of interchangeable tree nodes and scRNA clones to the get_C model. ignored with -match hungarian, where every node has its own scRNA clone')
+    parser.add_argument('-form', '--formulation', default = 'bits', choices = mb.FORMULATIONS, help = 'encoding of the copy number indicators in the get_C model. bits uses a binary expansion of each copy number (default). bigm uses one indicator per copy number and no helper integers')
+    parser.add_argument('-match', '--matching', default = 'milp', choices = mb.MATCHINGS, help = 'matching of tree nodes to scRNA clones. milp solves it inside the get_C model (default). hungarian leaves it out of the model and matches by least copy number distance after each get_C solve, which makes the model smaller')
+    parser.add_argument('-backend', '--backend', default = 'gurobi', choices = bk.BACKENDS, help = 'MILP solver for the get_C model. gurobi (default) needs a license seat per running job. cbc is open source (through pulp) and needs no license')
+    parser.add_argument('-obj_tol', '--obj_tol', default = None, type = lambda x: fm.valid_float_above(parser, x, 0.0), help = 'stop cordinate descent once the relative objective improvement stays below this for stall_iters iterations. by default it only stops when C stops changing')
+    parser.add_argument('-stall', '--stall_iters', default = 1, type = lambda x: fm.valid_int_in_range(parser, x, 1, MAX_CORD_DESC_ITERS), help = 'number of consecutive iterations below obj_tol before cordinate descent stops (default 1)')
+    parser.add_argument('-no_cycle', '--no_cycle_detection', action = 'store_true', help = 'do not stop cordinate descent when it returns to a (U, C) state of an earlier iteration')
+    parser.add_argument('-mip_gap', '--mip_gap', default = None, type = lambda x: fm.valid_float_above(parser, x, 0.0), help = 'relative MIP gap at which each get_C solve stops. default keeps the solver default')
+    parser.add_argument('-budget', '--time_budget', default = None, type = lambda x: fm.valid_float_above(parser, x, 0.0), help = 'maximum time (in seconds) of the whole run. the best solution so far is kept in the output directory, also if the run is stopped by SIGTERM')
+    parser.add_argument('--resume', action = 'store_true', help = 'continue an evicted run from the checkpoints in the output directory instead of starting over. run with the same arguments')
+    parser.add_argument('-seed', '--seed', default = None, type = lambda x: fm.valid_int_in_range(parser, x, 0, MAX_SEED), help = 'seed for subsampling and random restarts. drawn at random (and written to parameters.txt) if not given')
 
 # # # # # # # # # # # # # # # # # # # # # # # # #
 #   C A L L   T O   M A I N   F U N C T I O N   #